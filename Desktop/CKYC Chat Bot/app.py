@@ -1,11 +1,90 @@
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, g
+from werkzeug.middleware.proxy_fix import ProxyFix
+import os
+import threading
+import time
 import uuid
-from database import init_db, log_session, log_query, log_api_query, log_feedback, get_report
+import faqs
+import translations
+from storage import create_storage_from_env
 from faqs import get_faq_answer
-from translations import t
+from translations import t, translations_for
+from lookup_responses import institution_name, render
+from ckyc_client import RecordNotFound, RegistryError, create_client_from_env
+from singleflight import SingleFlight
+from ratelimit import create_limiters_from_env
+from fastjson import FastJSONProvider
+from compression import compress_response
+from live_stats import LiveStats
+from session_summary import REDIRECT_CATEGORY
+from startup import Startup
 
 app = Flask(__name__)
 app.secret_key = "ckyc-chatbot-secret-key-2026"
+app.json = FastJSONProvider(app)
+
+# Behind a load balancer every request comes from the proxy, so the per-IP
+# rate limit needs the client address from X-Forwarded-For. Only the given
+# number of hops is trusted; a client cannot spoof past them.
+trusted_proxies = int(os.environ.get("CKYC_TRUSTED_PROXIES", 0))
+if trusted_proxies:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxies, x_proto=trusted_proxies)
+
+storage = create_storage_from_env()
+
+# Running counters for the admin dashboard, polled from the shared log tables
+live_stats = LiveStats(storage.live_delta, poll_interval=float(os.environ.get("CKYC_LIVE_POLL_INTERVAL", 1)))
+
+registry = create_client_from_env()
+# Concurrent identical lookups share one upstream registry call
+registry_flight = SingleFlight()
+
+rate_limiter, admission = create_limiters_from_env()
+
+# The funnel report reads a rollup that is caught up here, every
+# CKYC_SUMMARY_INTERVAL seconds, and by maintenance; /api/funnel never does
+# the catch-up itself, so reports are as fresh as the last run. 0 leaves it
+# to maintenance alone.
+summary_interval = float(os.environ.get("CKYC_SUMMARY_INTERVAL", 60))
+
+
+def _summarize_loop():
+    while True:
+        try:
+            storage.summarize_sessions()
+        except Exception:
+            # Watermarks only move on commit, so the next run picks up where this stopped
+            app.logger.exception("Summarizing sessions failed")
+        time.sleep(summary_interval)
+
+
+def start_session_summary():
+    if summary_interval > 0:
+        threading.Thread(target=_summarize_loop, name="session-summary", daemon=True).start()
+
+# Migrations, indexes and connection pools are prepared once per process, not
+# on the first request. A failed step fails the import, so the process manager
+# restarts the worker. Set CKYC_BACKGROUND_STARTUP=1 to bind the port first,
+# answer /readyz with 503 until the steps finish, and retry failed steps.
+startup = Startup([
+    ("schema", storage.init),
+    ("storage_connections", storage.warm),
+    ("faq_index", faqs.build_index),
+    ("translations", translations.build_index),
+    ("registry_connections", registry.warm),
+    ("live_counters", live_stats.seed),
+    ("session_summary", start_session_summary),
+])
+if os.environ.get("CKYC_BACKGROUND_STARTUP") == "1":
+    startup.run_in_background()
+else:
+    startup.run()
+
+
+def registry_error_response(exc, lang):
+    if isinstance(exc, RecordNotFound):
+        return jsonify({"error": t("record_not_found", lang)}), 404
+    return jsonify({"error": t("registry_unavailable", lang)}), 503
 
 
 @app.before_request
@@ -17,6 +96,46 @@ def ensure_session():
         session["user_type"] = None
 
 
+@app.before_request
+def limit_api_requests():
+    if not request.path.startswith("/api/"):
+        return None
+    lang = session.get("language", "en")
+
+    if not startup.ready.is_set():
+        resp = jsonify({"error": t("server_busy", lang)})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        return resp
+
+    retry_after = rate_limiter.check({"session": session["session_id"], "ip": request.remote_addr})
+    if retry_after:
+        resp = jsonify({"error": t("rate_limited", lang)})
+        resp.status_code = 429
+        resp.headers["Retry-After"] = str(retry_after)
+        return resp
+
+    # Shed load early instead of letting requests queue until they time out
+    if not admission.try_acquire():
+        resp = jsonify({"error": t("server_busy", lang)})
+        resp.status_code = 503
+        resp.headers["Retry-After"] = "1"
+        return resp
+    g.admitted = True
+    return None
+
+
+@app.teardown_request
+def release_admission(exc):
+    if g.pop("admitted", False):
+        admission.release()
+
+
+@app.after_request
+def compress(response):
+    return compress_response(response, request.headers.get("Accept-Encoding", ""))
+
+
 @app.route("/")
 def index():
     return render_template("index.html")
@@ -41,7 +160,7 @@ def set_user_type():
     data = request.json
     user_type = data.get("user_type", "client")
     session["user_type"] = user_type
-    log_session(session["session_id"], session["language"], user_type)
+    storage.log_session(session["session_id"], session["language"], user_type)
     return jsonify({"status": "ok", "user_type": user_type})
 
 
@@ -58,7 +177,7 @@ def chat():
 
     if result["is_greeting"]:
         response = t("hello_response", lang)
-        log_query(session["session_id"], user_message, response, "Greeting", None, 1)
+        storage.log_query(session["session_id"], user_message, response, "Greeting", None, 1)
         session["wrong_count"] = 0
         return jsonify({
             "response": response,
@@ -68,7 +187,7 @@ def chat():
 
     if result["matched"]:
         response = result["answer"]
-        log_query(session["session_id"], user_message, response, result["category"], result["faq_id"], 1)
+        storage.log_query(session["session_id"], user_message, response, result["category"], result["faq_id"], 1)
         session["wrong_count"] = 0
         return jsonify({
             "response": response,
@@ -82,7 +201,7 @@ def chat():
 
     if wrong_count >= 3:
         response = t("redirect_msg", lang)
-        log_query(session["session_id"], user_message, response, None, None, 0)
+        storage.log_query(session["session_id"], user_message, response, REDIRECT_CATEGORY, None, 0)
         session["wrong_count"] = 0
         return jsonify({
             "response": response,
@@ -91,7 +210,7 @@ def chat():
         })
     else:
         response = t("not_understood", lang)
-        log_query(session["session_id"], user_message, response, None, None, 0)
+        storage.log_query(session["session_id"], user_message, response, None, None, 0)
         return jsonify({
             "response": response,
             "matched": False,
@@ -108,23 +227,13 @@ def check_status():
     if not reg_number:
         return jsonify({"error": "Registration number is required"}), 400
 
-    # Simulated status check (in production, this would call actual CKYC API)
-    statuses = {
-        "en": [
-            f"Registration/Acknowledgment Number: {reg_number}\nStatus: Under Processing\nSubmitted on: 2026-01-15\nExpected completion: 3-5 working days",
-            f"Registration/Acknowledgment Number: {reg_number}\nStatus: Accepted\nCKYC Number has been generated successfully.",
-            f"Registration/Acknowledgment Number: {reg_number}\nStatus: Pending Verification\nYour documents are under review.",
-        ],
-        "hi": [
-            f"पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: प्रसंस्करण के अंतर्गत\nजमा करने की तिथि: 2026-01-15\nअपेक्षित पूर्णता: 3-5 कार्य दिवस",
-            f"पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: स्वीकृत\nCKYC नंबर सफलतापूर्वक जनरेट हो गया है।",
-            f"पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: सत्यापन लंबित\nआपके दस्तावेज़ समीक्षाधीन हैं।",
-        ],
-    }
-
-    import random
-    status_response = random.choice(statuses.get(lang, statuses["en"]))
-    log_api_query(session["session_id"], "status_check", reg_number, status_response)
+    try:
+        record = registry_flight.do(("status_check", reg_number, None), lambda: registry.check_status(reg_number))
+    except RegistryError as exc:
+        return registry_error_response(exc, lang)
+
+    status_response = render("status_check", record["status"], lang, {**record, "reg_number": reg_number})
+    storage.log_api_query(session["session_id"], "status_check", reg_number, status_response)
 
     return jsonify({"response": status_response})
 
@@ -139,29 +248,13 @@ def wallet_inquiry():
     if not re_number:
         return jsonify({"error": "RE registration number is required"}), 400
 
-    # Simulated wallet data
-    wallet_data = {
-        1: {
-            "en": f"RE Number: {re_number}\nAvailable Balance: ₹15,250.75\nLast Transaction: 2026-02-05",
-            "hi": f"RE नंबर: {re_number}\nउपलब्ध शेष: ₹15,250.75\nअंतिम लेनदेन: 2026-02-05",
-        },
-        2: {
-            "en": f"RE Number: {re_number}\nTDS on Hold: ₹1,525.08\nFinancial Year: 2025-26",
-            "hi": f"RE नंबर: {re_number}\nहोल्ड पर TDS: ₹1,525.08\nवित्तीय वर्ष: 2025-26",
-        },
-        3: {
-            "en": f"RE Number: {re_number}\nThreshold Limit: ₹50,000.00\nCurrent Usage: ₹34,749.25",
-            "hi": f"RE नंबर: {re_number}\nसीमा सीमा: ₹50,000.00\nवर्तमान उपयोग: ₹34,749.25",
-        },
-        4: {
-            "en": f"RE Number: {re_number}\nMinimum Balance Limit: ₹5,000.00\nCurrent Balance: ₹15,250.75",
-            "hi": f"RE नंबर: {re_number}\nन्यूनतम शेष सीमा: ₹5,000.00\nवर्तमान शेष: ₹15,250.75",
-        },
-    }
+    try:
+        wallet = registry_flight.do(("wallet_inquiry", re_number, option), lambda: registry.wallet_inquiry(re_number))
+    except RegistryError as exc:
+        return registry_error_response(exc, lang)
 
-    response = wallet_data.get(int(option), wallet_data[1])
-    response_text = response.get(lang, response["en"])
-    log_api_query(session["session_id"], f"wallet_inquiry_{option}", re_number, response_text)
+    response_text = render("wallet_inquiry", int(option), lang, {**wallet, "re_number": re_number})
+    storage.log_api_query(session["session_id"], f"wallet_inquiry_{option}", re_number, response_text)
 
     return jsonify({"response": response_text})
 
@@ -176,20 +269,16 @@ def mismatch_check():
         return jsonify({"error": "CKYC number is required"}), 400
 
     if len(ckyc_number) != 14 or not ckyc_number.isdigit():
-        error_msg = {
-            "en": "Please enter a valid 14-digit CKYC number.",
-            "hi": "कृपया एक मान्य 14-अंकीय CKYC नंबर दर्ज करें।",
-        }
-        return jsonify({"error": error_msg.get(lang, error_msg["en"])}), 400
+        return jsonify({"error": t("invalid_ckyc_number", lang)}), 400
 
-    # Simulated response
-    response = {
-        "en": f"CKYC Number: {ckyc_number}\nRegistered Financial Institution: State Bank of India\nLast Updated: 2026-01-20\nStatus: Active\n\nIf you find any mismatch, please contact your Financial Institution to initiate the correction process.",
-        "hi": f"CKYC नंबर: {ckyc_number}\nपंजीकृत वित्तीय संस्थान: भारतीय स्टेट बैंक\nअंतिम अपडेट: 2026-01-20\nस्थिति: सक्रिय\n\nयदि आपको कोई बेमेल मिलता है, तो कृपया सुधार प्रक्रिया शुरू करने के लिए अपने वित्तीय संस्थान से संपर्क करें।",
-    }
+    try:
+        record = registry_flight.do(("mismatch_check", ckyc_number, None), lambda: registry.mismatch_check(ckyc_number))
+    except RegistryError as exc:
+        return registry_error_response(exc, lang)
 
-    response_text = response.get(lang, response["en"])
-    log_api_query(session["session_id"], "mismatch_check", ckyc_number, response_text)
+    fields = {**record, "ckyc_number": ckyc_number, "institution": institution_name(record["institution"], lang)}
+    response_text = render("mismatch_check", record["status"], lang, fields)
+    storage.log_api_query(session["session_id"], "mismatch_check", ckyc_number, response_text)
 
     return jsonify({"response": response_text})
 
@@ -202,7 +291,7 @@ def submit_feedback():
     feedback_text = data.get("feedback_text", "")
     lang = session.get("language", "en")
 
-    log_feedback(session["session_id"], rating, rating_value, feedback_text)
+    storage.log_feedback(session["session_id"], rating, rating_value, feedback_text)
 
     if rating_value <= 2:
         response = t("feedback_bad", lang)
@@ -235,20 +324,59 @@ def report():
     report_type = request.args.get("type", "today")
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
-    data = get_report(report_type, start_date, end_date)
+    data = storage.get_report(report_type, start_date, end_date)
     return jsonify(data)
 
 
+@app.route("/api/funnel", methods=["GET"])
+def funnel():
+    report_type = request.args.get("type", "today")
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    return jsonify(storage.get_funnel_report(report_type, start_date, end_date))
+
+
+@app.route("/api/live", methods=["GET"])
+def live():
+    queue = live_stats.subscribe()
+    return Response(
+        live_stats.stream(queue),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.route("/api/translations", methods=["GET"])
 def get_translations():
     lang = request.args.get("lang", "en")
-    from translations import TRANSLATIONS
-    result = {}
-    for key, val in TRANSLATIONS.items():
-        result[key] = val.get(lang, val.get("en", key))
-    return jsonify(result)
+    return jsonify(translations_for(lang))
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    return jsonify({
+        "registry": registry.stats(),
+        "coalescing": registry_flight.stats(),
+        "live_subscribers": live_stats.subscriber_count(),
+        "admission": {
+            "in_flight": admission.in_flight,
+            "max_in_flight": admission.max_in_flight,
+            "shed": admission.shed,
+            "rate_limited": rate_limiter.limited,
+        },
+    })
+
+
+@app.route("/healthz", methods=["GET"])
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readyz():
+    status = startup.status()
+    return jsonify(status), 200 if status["ready"] else 503
 
 
 if __name__ == "__main__":
-    init_db()
     app.run(debug=True, port=5000)
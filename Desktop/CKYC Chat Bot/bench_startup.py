@@ -0,0 +1,83 @@
+"""
+Cold start benchmark: how long a fresh worker takes to become ready and how
+much slower its first request is than the steady state.
+
+    python bench_startup.py [--runs 5] [--requests 200]
+
+Each run imports the app in a new process against a temporary database. The
+first run creates and migrates the schema; later runs reuse it, as a restarted
+worker would.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs inside the child process; prints one JSON line of measurements
+CHILD = r"""
+import json, sys, time
+begin = time.perf_counter()
+import app as A
+imported = (time.perf_counter() - begin) * 1000
+client = A.app.test_client()
+client.post("/api/set-language", json={"language": "en"})
+
+def timed(message):
+    t0 = time.perf_counter()
+    status = client.post("/api/chat", json={"message": message}).status_code
+    elapsed = (time.perf_counter() - t0) * 1000
+    if status != 200:
+        sys.exit(f"/api/chat answered {status}; the benchmark would time the rejection path")
+    return elapsed
+
+first = timed("how do I update my KYC")
+steady = sorted(timed("how do I update my KYC") for _ in range(int(sys.argv[1])))
+print(json.dumps({
+    "import_ms": imported,
+    "steps_ms": A.startup.timings,
+    "ready": A.startup.ready.is_set(),
+    "first_request_ms": first,
+    "steady_p50_ms": steady[len(steady) // 2],
+}))
+"""
+
+
+def run_once(db_path, requests):
+    # One session sends every request, so lift the rate limits out of the way
+    env = dict(
+        os.environ, CKYC_DB_PATH=db_path, CKYC_STORAGE="sqlite", CKYC_BACKGROUND_STARTUP="0",
+        CKYC_SESSION_RATE="1000000", CKYC_SESSION_BURST="1000000", CKYC_IP_RATE="1000000", CKYC_IP_BURST="1000000",
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, str(requests)],
+        cwd=HERE, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure worker cold start and first-request latency")
+    parser.add_argument("--runs", type=int, default=5, help="worker starts to measure")
+    parser.add_argument("--requests", type=int, default=200, help="requests used for the steady-state latency")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        results = [run_once(db_path, args.requests) for _ in range(args.runs)]
+
+    print(f"{'run':>4} {'import':>9} {'startup':>9} {'schema':>8} {'first req':>10} {'p50 req':>8}")
+    for i, r in enumerate(results, 1):
+        print(f"{i:>4} {r['import_ms']:>7.1f}ms {r['steps_ms'].get('total', 0):>7.1f}ms "
+              f"{r['steps_ms'].get('schema', 0):>6.1f}ms {r['first_request_ms']:>8.2f}ms {r['steady_p50_ms']:>6.2f}ms")
+
+    warm = results[1:] or results
+    print(f"\nwarm restarts: import {statistics.median(r['import_ms'] for r in warm):.1f}ms median, "
+          f"first request {statistics.median(r['first_request_ms'] for r in warm):.2f}ms vs "
+          f"steady {statistics.median(r['steady_p50_ms'] for r in warm):.2f}ms")
+    slowest = max(results[-1]["steps_ms"].items(), key=lambda kv: kv[1] if kv[0] != "total" else -1)
+    print(f"slowest startup step: {slowest[0]} ({slowest[1]:.1f}ms)")
@@ -0,0 +1,379 @@
+"""
+Client for the CKYC registry lookup APIs (status, wallet, mismatch).
+
+The transport is pluggable: SimulatedTransport answers from canned data and is
+used when no registry URL is configured, HttpTransport talks to the registry
+over a pool of keep-alive connections. CkycClient adds per-call timeouts,
+retries with jitter, a circuit breaker and a TTL cache per (endpoint, id).
+
+Configuration (environment):
+    CKYC_API_URL          registry base URL, e.g. http://127.0.0.1:5050
+    CKYC_API_TIMEOUT      per-call timeout in seconds (default 3)
+    CKYC_API_RETRIES      retries after the first attempt (default 2)
+    CKYC_API_POOL_SIZE    idle keep-alive connections kept (default 8)
+    CKYC_CACHE_TTL        seconds a lookup result is cached (default 60)
+"""
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from queue import Empty, Full, LifoQueue
+from urllib.parse import quote, urlsplit
+
+ENDPOINTS = ("status", "wallet", "mismatch")
+
+STATUS_CODES = ["under_processing", "accepted", "pending_verification"]
+
+# Fields the lookup responses are rendered from; a record missing any is malformed
+REQUIRED_FIELDS = {
+    "status": ("status", "submitted_on", "expected_completion"),
+    "wallet": (
+        "available_balance", "last_transaction", "tds_on_hold", "financial_year", "threshold_limit",
+        "current_usage", "minimum_balance_limit", "current_balance",
+    ),
+    "mismatch": ("institution", "last_updated", "status"),
+}
+
+
+# What a pooled keep-alive connection raises once the far end has closed it
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError)
+
+
+class RegistryError(Exception):
+    """Raised when the registry cannot answer a lookup."""
+
+
+class RecordNotFound(RegistryError):
+    """Raised when the registry has no record for the given number."""
+
+
+class RegistryUnavailable(RegistryError):
+    """Raised when the registry is down, too slow, or the circuit is open."""
+
+
+def simulated_record(endpoint, ident):
+    """Canned registry record, stable for a given id."""
+    if endpoint == "status":
+        return {
+            "reg_number": ident,
+            "status": STATUS_CODES[zlib.crc32(ident.encode("utf-8")) % len(STATUS_CODES)],
+            "submitted_on": "2026-01-15",
+            "expected_completion": "3-5",
+        }
+    if endpoint == "wallet":
+        return {
+            "re_number": ident,
+            "available_balance": "15,250.75",
+            "last_transaction": "2026-02-05",
+            "tds_on_hold": "1,525.08",
+            "financial_year": "2025-26",
+            "threshold_limit": "50,000.00",
+            "current_usage": "34,749.25",
+            "minimum_balance_limit": "5,000.00",
+            "current_balance": "15,250.75",
+        }
+    if endpoint == "mismatch":
+        return {
+            "ckyc_number": ident,
+            "institution": "State Bank of India",
+            "last_updated": "2026-01-20",
+            "status": "active",
+        }
+    raise RecordNotFound(f"unknown endpoint: {endpoint}")
+
+
+def check_record(endpoint, record):
+    """Raise RegistryUnavailable unless record is an object with the fields the responses need."""
+    if not isinstance(record, dict):
+        raise RegistryUnavailable(f"{endpoint} lookup returned {type(record).__name__}, expected an object")
+    missing = [field for field in REQUIRED_FIELDS.get(endpoint, ()) if field not in record]
+    if missing:
+        raise RegistryUnavailable(f"{endpoint} record is missing {', '.join(missing)}")
+
+
+class SimulatedTransport:
+    """Answers lookups locally without any network call."""
+
+    def request(self, endpoint, ident, timeout):
+        return simulated_record(endpoint, ident)
+
+    def warm(self, timeout):
+        pass
+
+    def close(self):
+        pass
+
+
+class HttpTransport:
+    """GET {base_url}/{endpoint}/{id} over a pool of keep-alive connections."""
+
+    def __init__(self, base_url, pool_size=8):
+        parts = urlsplit(base_url)
+        self._conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self._pool = LifoQueue(maxsize=pool_size)
+
+    def _acquire(self, timeout):
+        """A pooled connection if one is idle, else a new one. Returns (conn, reused)."""
+        try:
+            conn = self._pool.get_nowait()
+            reused = True
+        except Empty:
+            conn = self._conn_cls(self._host, self._port, timeout=timeout)
+            reused = False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, reused
+
+    def _release(self, conn):
+        try:
+            self._pool.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def request(self, endpoint, ident, timeout):
+        path = f"{self._prefix}/{endpoint}/{quote(ident, safe='')}"
+        conn, reused = self._acquire(timeout)
+        try:
+            resp, body = self._get(conn, path)
+        except STALE_CONNECTION_ERRORS as exc:
+            conn.close()
+            if not reused:
+                raise RegistryUnavailable(f"{endpoint} lookup failed: {exc}") from exc
+            # The registry or a load balancer closed the idle keep-alive socket;
+            # that says nothing about the registry, so retry once on a new one
+            conn = self._conn_cls(self._host, self._port, timeout=timeout)
+            try:
+                resp, body = self._get(conn, path)
+            except (OSError, http.client.HTTPException) as exc:
+                conn.close()
+                raise RegistryUnavailable(f"{endpoint} lookup failed: {exc}") from exc
+        except (OSError, http.client.HTTPException) as exc:
+            conn.close()
+            raise RegistryUnavailable(f"{endpoint} lookup failed: {exc}") from exc
+
+        if resp.will_close:
+            conn.close()
+        else:
+            self._release(conn)
+
+        if resp.status == 404:
+            raise RecordNotFound(f"no {endpoint} record for {ident}")
+        if resp.status >= 500 or resp.status == 429:
+            raise RegistryUnavailable(f"{endpoint} lookup returned HTTP {resp.status}")
+        if resp.status != 200:
+            raise RegistryError(f"{endpoint} lookup returned HTTP {resp.status}")
+        try:
+            return json.loads(body)
+        except ValueError as exc:
+            # e.g. a maintenance page served with 200
+            raise RegistryUnavailable(f"{endpoint} lookup returned a body that is not JSON") from exc
+
+    @staticmethod
+    def _get(conn, path):
+        conn.request("GET", path, headers={"Accept": "application/json"})
+        resp = conn.getresponse()
+        return resp, resp.read()
+
+    def warm(self, timeout):
+        """Open keep-alive connections up to the pool size; an unreachable registry is not fatal."""
+        while not self._pool.full():
+            conn = self._conn_cls(self._host, self._port, timeout=timeout)
+            try:
+                conn.connect()
+            except OSError:
+                conn.close()
+                return
+            self._release(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open).
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl=60.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CkycClient:
+    """Registry lookups with caching, retries and a circuit breaker."""
+
+    def __init__(self, transport, timeout=3.0, retries=2, backoff=0.1, cache_ttl=60.0, breaker=None):
+        self.transport = transport
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache = TTLCache(cache_ttl)
+        self.breaker = breaker or CircuitBreaker()
+        self._stats_lock = threading.Lock()
+        self._stats = {"cache_hits": 0, "cache_misses": 0, "upstream_calls": 0, "upstream_failures": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def lookup(self, endpoint, ident):
+        key = (endpoint, ident)
+        record = self.cache.get(key)
+        if record is not None:
+            self._count("cache_hits")
+            return record
+        self._count("cache_misses")
+        record = self._fetch(endpoint, ident)
+        self.cache.set(key, record)
+        return record
+
+    def _fetch(self, endpoint, ident):
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                raise RegistryUnavailable("registry circuit is open")
+            self._count("upstream_calls")
+            try:
+                record = self.transport.request(endpoint, ident, self.timeout)
+                check_record(endpoint, record)
+            except RegistryUnavailable as exc:
+                self._count("upstream_failures")
+                self.breaker.record_failure()
+                last_error = exc
+                if attempt < self.retries:
+                    # Full jitter keeps retrying clients from hitting the registry in lockstep
+                    time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+                continue
+            except RegistryError:
+                # The registry answered, so it is healthy even if the lookup was rejected
+                self.breaker.record_success()
+                raise
+            except Exception:
+                # Anything unexpected still ends a half-open trial, or the circuit would never close
+                self.breaker.record_failure()
+                raise
+            self.breaker.record_success()
+            return record
+        raise last_error
+
+    def check_status(self, reg_number):
+        return self.lookup("status", reg_number)
+
+    def wallet_inquiry(self, re_number):
+        return self.lookup("wallet", re_number)
+
+    def mismatch_check(self, ckyc_number):
+        return self.lookup("mismatch", ckyc_number)
+
+    def warm(self):
+        self.transport.warm(self.timeout)
+
+    def stats(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["cache_entries"] = len(self.cache)
+        stats["circuit"] = self.breaker.state
+        return stats
+
+    def close(self):
+        self.transport.close()
+
+
+def create_client_from_env():
+    base_url = os.environ.get("CKYC_API_URL")
+    if base_url:
+        transport = HttpTransport(base_url, pool_size=int(os.environ.get("CKYC_API_POOL_SIZE", 8)))
+    else:
+        transport = SimulatedTransport()
+    return CkycClient(
+        transport,
+        timeout=float(os.environ.get("CKYC_API_TIMEOUT", 3)),
+        retries=int(os.environ.get("CKYC_API_RETRIES", 2)),
+        cache_ttl=float(os.environ.get("CKYC_CACHE_TTL", 60)),
+    )
@@ -0,0 +1,91 @@
+"""
+Response compression negotiated from the request's Accept-Encoding header.
+
+Brotli is used when the `brotli` package is installed and the client accepts
+it, gzip otherwise. Small bodies, streamed responses, files served directly
+and non-text types are left alone.
+
+Configuration (environment):
+    CKYC_COMPRESS_MIN_SIZE   smallest body in bytes worth compressing (default 1024)
+    CKYC_GZIP_LEVEL          gzip level 1-9 (default 6)
+    CKYC_BROTLI_QUALITY      brotli quality 0-11 (default 5)
+"""
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = int(os.environ.get("CKYC_COMPRESS_MIN_SIZE", 1024))
+GZIP_LEVEL = int(os.environ.get("CKYC_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("CKYC_BROTLI_QUALITY", 5))
+
+COMPRESSIBLE_TYPES = ("application/json", "application/javascript", "image/svg+xml")
+
+
+def parse_accept_encoding(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    codings = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+def choose_encoding(header):
+    codings = parse_accept_encoding(header or "")
+    wildcard = codings.get("*", 0.0)
+    available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for coding in available:
+        q = codings.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith("text/") or mimetype in COMPRESSIBLE_TYPES)
+
+
+def compress_response(response, accept_encoding):
+    if (
+        response.direct_passthrough
+        or response.is_streamed
+        or response.status_code < 200
+        or response.status_code in (204, 304)
+        or "Content-Encoding" in response.headers
+        or not is_compressible(response.mimetype)
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+
+    encoding = choose_encoding(accept_encoding)
+    if encoding == "br":
+        compressed = brotli.compress(data, quality=BROTLI_QUALITY)
+    elif encoding == "gzip":
+        compressed = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    else:
+        return response
+
+    if len(compressed) >= len(data):
+        return response
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    return response
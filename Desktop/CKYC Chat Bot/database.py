@@ -1,8 +1,52 @@
 import sqlite3
 import os
-from datetime import datetime, timedelta
+import gzip
+import shutil
+import hashlib
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from queue import Empty, Full, LifoQueue
+from urllib.parse import quote
 
-DB_PATH = os.path.join(os.path.dirname(__file__), "ckyc_chatbot.db")
+import session_summary
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get("CKYC_DB_PATH", os.path.join(os.path.dirname(__file__), "ckyc_chatbot.db"))
+
+# Store each distinct bot response once in `responses` and reference it from
+# `query_log`; `queries` then becomes a view with the original columns.
+# Setting this converts the database on init_db(); the conversion is one-way,
+# so which layout is in use is read from the schema, not from this flag.
+NORMALIZED_RESPONSES = os.environ.get("CKYC_NORMALIZED_RESPONSES", "0") == "1"
+
+# Whether queries is a view over query_log, read from the schema by normalized_responses()
+_normalized = None
+
+# Response text -> responses.id, filled by log_query() once the row is committed
+_response_ids = {}
+
+# Open connections reused by the log_* functions, so a chat turn does not pay
+# for opening the file and loading the schema; warm_db() fills it at startup
+LOG_POOL_SIZE = int(os.environ.get("CKYC_DB_POOL_SIZE", 5))
+_log_pool = LifoQueue(maxsize=LOG_POOL_SIZE)
+
+# Closed months are moved out of the hot database into one file per month.
+# Partitions older than ARCHIVE_AFTER_MONTHS are gzipped into ARCHIVE_DIR and
+# no longer appear in reports; archives older than RETENTION_MONTHS are deleted.
+PARTITION_DIR = os.environ.get("CKYC_PARTITION_DIR", os.path.join(os.path.dirname(__file__), "partitions"))
+ARCHIVE_DIR = os.environ.get("CKYC_ARCHIVE_DIR", os.path.join(os.path.dirname(__file__), "archive"))
+HOT_MONTHS = int(os.environ.get("CKYC_HOT_MONTHS", 1))
+ARCHIVE_AFTER_MONTHS = int(os.environ.get("CKYC_ARCHIVE_AFTER_MONTHS", 12))
+RETENTION_MONTHS = int(os.environ.get("CKYC_RETENTION_MONTHS", 36))
+
+PARTITIONED_TABLES = ["chat_sessions", "queries", "api_queries", "feedback"]
+
+# SQLite attaches at most 10 databases per connection, main included
+ATTACH_BATCH = 9
 
 
 def get_db():
@@ -13,6 +57,104 @@ def get_db():
 
 def init_db():
     conn = get_db()
+    # Takes effect only on a new, empty file; an existing one is converted
+    # offline by vacuum_db(), since that rewrites the whole file
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+
+    global _normalized
+    create_schema(conn, NORMALIZED_RESPONSES or _queries_is_view(conn))
+    _normalized = _queries_is_view(conn)
+
+    conn.commit()
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        logger.warning(
+            "%s does not use incremental auto-vacuum, so maintenance cannot return freed pages to the OS; "
+            "run `python maintenance.py --vacuum` while the app is stopped", DB_PATH,
+        )
+    conn.close()
+
+
+def vacuum_db():
+    """
+    Rewrite the database with a full VACUUM, switching it to incremental
+    auto-vacuum and reclaiming all free pages, e.g. after normalizing
+    responses. Holds an exclusive lock for as long as the rewrite takes, so
+    run it only while the app is stopped.
+    """
+    conn = get_db()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def _open_log_connection():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # Parses the schema now rather than on the connection's first insert
+    conn.execute("SELECT name FROM sqlite_master").fetchall()
+    return conn
+
+
+@contextmanager
+def _log_connection():
+    """A pooled connection for one logging transaction; the caller commits."""
+    try:
+        conn = _log_pool.get_nowait()
+    except Empty:
+        conn = _open_log_connection()
+    try:
+        yield conn
+    except Exception:
+        # Never hand a connection in an unknown state to the next request
+        conn.close()
+        raise
+    try:
+        _log_pool.put_nowait(conn)
+    except Full:
+        conn.close()
+
+
+def warm_db():
+    """Fill the logging connection pool before the first request."""
+    while not _log_pool.full():
+        try:
+            _log_pool.put_nowait(_open_log_connection())
+        except Full:
+            break
+
+
+def _queries_is_view(conn):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = 'queries'").fetchone()
+    return row is not None and row[0] == "view"
+
+
+def normalized_responses():
+    """True if this database stores queries as query_log + responses."""
+    global _normalized
+    if _normalized is None:
+        conn = get_db()
+        _normalized = _queries_is_view(conn)
+        conn.close()
+    return _normalized
+
+
+def create_schema(conn, normalize=False):
+    """
+    Bring the schema on conn up to date: apply pending MIGRATIONS, tracked in
+    PRAGMA user_version, then normalize responses if asked. Holds the write
+    lock throughout so concurrently starting workers migrate once.
+    The caller commits. Returns True if the queries table was normalized.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for migration in MIGRATIONS[version:]:
+        migration(conn)
+    if version < len(MIGRATIONS):
+        conn.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+    return normalize and migrate_to_normalized_responses(conn)
+
+
+def _create_base_tables(conn):
     c = conn.cursor()
 
     c.execute("""
@@ -60,54 +202,447 @@ def init_db():
         )
     """)
 
-    conn.commit()
-    conn.close()
+
+def _add_created_at_indexes(conn):
+    for table in PARTITIONED_TABLES:
+        row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        # A normalized queries view is indexed through query_log instead
+        if row is not None and row["type"] == "table":
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at)")
+
+
+def _create_session_summary(conn):
+    for statement in session_summary.SCHEMA:
+        conn.execute(statement)
+
+
+# Applied in order, once per database; never edit or reorder released entries
+MIGRATIONS = [
+    _create_base_tables,
+    _add_created_at_indexes,
+    _create_session_summary,
+]
+
+
+def response_hash(text):
+    """64-bit signed hash used to intern bot responses."""
+    if text is None:
+        return None
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def migrate_to_normalized_responses(conn):
+    """
+    Convert a plain `queries` table into `responses` + `query_log` and replace
+    it with a view of the same shape. Does nothing if already converted.
+    Returns True if existing rows were moved.
+    """
+    c = conn.cursor()
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hash INTEGER NOT NULL UNIQUE,
+            text TEXT NOT NULL
+        )
+    """)
+
+    row = c.execute("SELECT type FROM sqlite_master WHERE name = 'queries'").fetchone()
+    if row is not None and row["type"] == "view":
+        return False
+
+    c.execute("""
+        CREATE TABLE IF NOT EXISTS query_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            user_message TEXT NOT NULL,
+            response_id INTEGER REFERENCES responses(id),
+            category TEXT,
+            matched_faq_id TEXT,
+            was_answered INTEGER DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_query_log_created_at ON query_log (created_at)")
+
+    if row is not None:
+        conn.create_function("response_hash", 1, response_hash, deterministic=True)
+        c.execute("""
+            INSERT OR IGNORE INTO responses (hash, text)
+            SELECT response_hash(bot_response), bot_response FROM queries
+            WHERE bot_response IS NOT NULL GROUP BY bot_response
+        """)
+        c.execute("""
+            INSERT INTO query_log (id, session_id, user_message, response_id, category, matched_faq_id, was_answered, created_at)
+            SELECT q.id, q.session_id, q.user_message, r.id, q.category, q.matched_faq_id, q.was_answered, q.created_at
+            FROM queries q LEFT JOIN responses r ON r.hash = response_hash(q.bot_response)
+        """)
+        c.execute("DROP TABLE queries")
+
+    c.execute("""
+        CREATE VIEW queries AS
+        SELECT q.id, q.session_id, q.user_message, r.text AS bot_response, q.category,
+               q.matched_faq_id, q.was_answered, q.created_at
+        FROM query_log q LEFT JOIN responses r ON r.id = q.response_id
+    """)
+    return row is not None
+
+
+def intern_response(conn, text):
+    """
+    Return the responses.id for text, inserting it on first use. The id is only
+    cached by the caller after commit, since a rolled back insert frees it.
+    """
+    if text is None:
+        return None
+    response_id = _response_ids.get(text)
+    if response_id is None:
+        h = response_hash(text)
+        conn.execute("INSERT OR IGNORE INTO responses (hash, text) VALUES (?, ?)", (h, text))
+        response_id = conn.execute("SELECT id FROM responses WHERE hash = ?", (h,)).fetchone()["id"]
+    return response_id
 
 
 def log_session(session_id, language, user_type):
-    conn = get_db()
-    conn.execute(
-        "INSERT INTO chat_sessions (session_id, language, user_type) VALUES (?, ?, ?)",
-        (session_id, language, user_type),
-    )
-    conn.commit()
-    conn.close()
+    with _log_connection() as conn:
+        conn.execute(
+            "INSERT INTO chat_sessions (session_id, language, user_type) VALUES (?, ?, ?)",
+            (session_id, language, user_type),
+        )
+        conn.commit()
 
 
 def log_query(session_id, user_message, bot_response, category, matched_faq_id, was_answered):
+    response_id = None
+    with _log_connection() as conn:
+        if normalized_responses():
+            response_id = intern_response(conn, bot_response)
+            conn.execute(
+                "INSERT INTO query_log (session_id, user_message, response_id, category, matched_faq_id, was_answered) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, user_message, response_id, category, matched_faq_id, was_answered),
+            )
+        else:
+            conn.execute(
+                "INSERT INTO queries (session_id, user_message, bot_response, category, matched_faq_id, was_answered) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, user_message, bot_response, category, matched_faq_id, was_answered),
+            )
+        conn.commit()
+    if response_id is not None:
+        _response_ids[bot_response] = response_id
+
+
+def log_api_query(session_id, query_type, input_value, result):
+    with _log_connection() as conn:
+        conn.execute(
+            "INSERT INTO api_queries (session_id, query_type, input_value, result) VALUES (?, ?, ?, ?)",
+            (session_id, query_type, input_value, result),
+        )
+        conn.commit()
+
+
+def log_feedback(session_id, rating, rating_value, feedback_text):
+    with _log_connection() as conn:
+        conn.execute(
+            "INSERT INTO feedback (session_id, rating, rating_value, feedback_text) VALUES (?, ?, ?, ?)",
+            (session_id, rating, rating_value, feedback_text),
+        )
+        conn.commit()
+
+
+def _add_months(day, months):
+    """First day of the month `months` away from the month containing day."""
+    index = day.year * 12 + day.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def _storage_table(table):
+    if table == "queries" and normalized_responses():
+        return "query_log"
+    return table
+
+
+def partition_path(month):
+    """Path of the partition file for a "YYYY-MM" month."""
+    return os.path.join(PARTITION_DIR, f"ckyc_{month.replace('-', '_')}.db")
+
+
+def partition_months():
+    """Months that have a partition file, oldest first."""
+    if not os.path.isdir(PARTITION_DIR):
+        return []
+    months = []
+    for name in os.listdir(PARTITION_DIR):
+        if name.startswith("ckyc_") and name.endswith(".db"):
+            months.append(name[len("ckyc_"):-len(".db")].replace("_", "-"))
+    return sorted(months)
+
+
+def roll_partitions(now=None):
+    """
+    Move rows from months before the hot window into their monthly partition
+    files, then give the freed pages back with an incremental vacuum.
+    Returns the months that received rows.
+    """
+    now = now or datetime.now()
+    cutoff = _add_months(now, 1 - HOT_MONTHS).strftime("%Y-%m-%d 00:00:00")
+
+    # Rows leaving the hot database must be counted in the session summary first
+    summarize_sessions()
+
     conn = get_db()
-    conn.execute(
-        "INSERT INTO queries (session_id, user_message, bot_response, category, matched_faq_id, was_answered) VALUES (?, ?, ?, ?, ?, ?)",
-        (session_id, user_message, bot_response, category, matched_faq_id, was_answered),
-    )
-    conn.commit()
+    months = set()
+    for table in PARTITIONED_TABLES:
+        rows = conn.execute(
+            f"SELECT DISTINCT strftime('%Y-%m', created_at) AS month FROM {_storage_table(table)} WHERE created_at < ?",
+            (cutoff,),
+        ).fetchall()
+        months.update(row["month"] for row in rows if row["month"])
+
+    os.makedirs(PARTITION_DIR, exist_ok=True)
+    for month in sorted(months):
+        path = partition_path(month)
+        part = sqlite3.connect(path)
+        part.row_factory = sqlite3.Row
+        create_schema(part, normalized_responses())
+        part.commit()
+        part.close()
+
+        month_start = datetime.strptime(month, "%Y-%m")
+        bounds = (month_start.strftime("%Y-%m-%d 00:00:00"), _add_months(month_start, 1).strftime("%Y-%m-%d 00:00:00"))
+
+        conn.execute("ATTACH DATABASE ? AS part", (path,))
+        try:
+            if normalized_responses():
+                conn.execute(
+                    "INSERT OR IGNORE INTO part.responses SELECT * FROM main.responses WHERE id IN "
+                    "(SELECT response_id FROM main.query_log WHERE created_at >= ? AND created_at < ?)",
+                    bounds,
+                )
+            for table in PARTITIONED_TABLES:
+                name = _storage_table(table)
+                columns = ", ".join(row["name"] for row in conn.execute(f"PRAGMA main.table_info({name})"))
+                conn.execute(
+                    f"INSERT OR IGNORE INTO part.{name} ({columns}) SELECT {columns} FROM main.{name} "
+                    "WHERE created_at >= ? AND created_at < ?",
+                    bounds,
+                )
+                conn.execute(f"DELETE FROM main.{name} WHERE created_at >= ? AND created_at < ?", bounds)
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE part")
+
+    # execute() steps this pragma only once (one page); executescript runs it to completion
+    conn.executescript("PRAGMA incremental_vacuum;")
     conn.close()
+    return sorted(months)
 
 
-def log_api_query(session_id, query_type, input_value, result):
+def archive_partitions(now=None):
+    """
+    Gzip partitions older than ARCHIVE_AFTER_MONTHS into ARCHIVE_DIR and delete
+    archives older than RETENTION_MONTHS. Returns (archived, deleted) months.
+    """
+    now = now or datetime.now()
+    archive_before = _add_months(now, -ARCHIVE_AFTER_MONTHS).strftime("%Y-%m")
+    delete_before = _add_months(now, -RETENTION_MONTHS).strftime("%Y-%m")
+
+    archived = []
+    for month in partition_months():
+        if month >= archive_before:
+            continue
+        path = partition_path(month)
+        if month >= delete_before:
+            os.makedirs(ARCHIVE_DIR, exist_ok=True)
+            target = os.path.join(ARCHIVE_DIR, os.path.basename(path) + ".gz")
+            with open(path, "rb") as src, gzip.open(target + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.replace(target + ".tmp", target)
+            archived.append(month)
+        os.remove(path)
+
+    deleted = []
+    if os.path.isdir(ARCHIVE_DIR):
+        for name in sorted(os.listdir(ARCHIVE_DIR)):
+            if name.startswith("ckyc_") and name.endswith(".db.gz"):
+                month = name[len("ckyc_"):-len(".db.gz")].replace("_", "-")
+                if month < delete_before:
+                    os.remove(os.path.join(ARCHIVE_DIR, name))
+                    deleted.append(month)
+    return archived, deleted
+
+
+def prune_session_summary(now=None):
+    """Drop summary rows of sessions last seen before the hot window. Returns how many."""
+    now = now or datetime.now()
+    cutoff = _add_months(now, 1 - HOT_MONTHS).strftime("%Y-%m-%d 00:00:00")
     conn = get_db()
-    conn.execute(
-        "INSERT INTO api_queries (session_id, query_type, input_value, result) VALUES (?, ?, ?, ?)",
-        (session_id, query_type, input_value, result),
-    )
+    c = conn.cursor()
+    c.execute(session_summary.LOCK["sqlite"])
+    pruned = session_summary.prune(c, str, cutoff)
     conn.commit()
     conn.close()
+    return pruned
 
 
-def log_feedback(session_id, rating, rating_value, feedback_text):
+def run_maintenance(now=None):
+    """
+    Catch up the session summary and prune it to the hot window, roll closed
+    months into partitions, then apply archival and retention.
+    """
+    summarized = summarize_sessions()
+    pruned = prune_session_summary(now)
+    rolled = roll_partitions(now)
+    archived, deleted = archive_partitions(now)
+    return {"summarized": summarized, "pruned": pruned, "rolled": rolled, "archived": archived, "deleted": deleted}
+
+
+def iter_unanswered_queries(after_id=0, start=None, end=None, batch_size=1000):
+    """
+    Yield (id, user_message, created_at) for unanswered queries with id > after_id
+    in id order, reading partitions in the range before the hot database.
+    """
+    start = start or "2000-01-01 00:00:00"
+    end = end or datetime.now().strftime("%Y-%m-%d 23:59:59")
+    sources = [partition_path(m) for m in partition_months() if start[:7] <= m <= end[:7]]
+    sources.append(DB_PATH)
+
+    for path in sources:
+        conn = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+        try:
+            last_id = after_id
+            while True:
+                rows = conn.execute(
+                    "SELECT id, user_message, created_at FROM queries "
+                    "WHERE was_answered = 0 AND id > ? AND created_at BETWEEN ? AND ? ORDER BY id LIMIT ?",
+                    (last_id, start, end, batch_size),
+                ).fetchall()
+                if not rows:
+                    break
+                yield from rows
+                last_id = rows[-1][0]
+        finally:
+            conn.close()
+
+
+def _partition_id_ranges(source):
+    """(path, min id, max id) of source in every partition that has rows."""
+    ranges = []
+    for month in partition_months():
+        path = partition_path(month)
+        part = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+        try:
+            low, high = part.execute(f"SELECT MIN(id), MAX(id) FROM {source}").fetchone()
+        finally:
+            part.close()
+        if low is not None:
+            ranges.append((path, low, high))
+    return ranges
+
+
+def _summarize_chunk(ranges):
+    """
+    One short transaction of the session summary catch-up: up to CHUNK_SIZE ids
+    per source. Ids below the hot database's lowest were rolled into partitions
+    before they were summarized (e.g. when the summary was first added), so
+    those are read from the partition files. Returns (merged, done).
+    """
     conn = get_db()
-    conn.execute(
-        "INSERT INTO feedback (session_id, rating, rating_value, feedback_text) VALUES (?, ?, ?, ?)",
-        (session_id, rating, rating_value, feedback_text),
-    )
+    c = conn.cursor()
+    c.execute(session_summary.LOCK["sqlite"])
+    marks = session_summary.watermarks(c)
+    merged = 0
+    done = True
+    for source in session_summary.SOURCES:
+        last_id = marks.get(source, 0)
+        low, top = c.execute(f"SELECT MIN(id), MAX(id) FROM {source}").fetchone()
+        parts = []
+        if low is None or last_id + 1 < low:
+            if source not in ranges:
+                ranges[source] = _partition_id_ranges(source)
+            parts = [(path, first) for path, first, last in ranges[source] if last > last_id]
+            top = max([top or 0] + [last for _, _, last in ranges[source]])
+        top = top or 0
+        if top <= last_id:
+            continue
+        upto = min(last_id + session_summary.CHUNK_SIZE, top)
+        # qmark placeholders need no rewriting, hence sql=str
+        for path, first in parts:
+            if first > upto:
+                continue
+            part = sqlite3.connect(f"file:{quote(os.path.abspath(path))}?mode=ro", uri=True)
+            try:
+                rows = session_summary.aggregate(part.cursor(), str, source, last_id, upto)
+            finally:
+                part.close()
+            session_summary.fold(c, str, "sqlite", source, rows)
+            merged += len(rows)
+        rows = session_summary.aggregate(c, str, source, last_id, upto)
+        session_summary.fold(c, str, "sqlite", source, rows)
+        session_summary.set_watermark(c, str, source, upto)
+        merged += len(rows)
+        done = done and upto == top
     conn.commit()
     conn.close()
+    return merged, done
 
 
-def get_report(report_type, start_date=None, end_date=None):
+def summarize_sessions():
+    """
+    Fold log rows added since the last run into session_summary, one short
+    transaction per chunk so log writes are never held up for long.
+    Returns the session rows merged.
+    """
+    ranges = {}
+    merged, done = _summarize_chunk(ranges)
+    while not done:
+        time.sleep(session_summary.CHUNK_PAUSE)
+        count, done = _summarize_chunk(ranges)
+        merged += count
+    return merged
+
+
+def get_funnel_report(report_type, start_date=None, end_date=None):
+    """Funnel report from the rollup as of the last summarize_sessions() run."""
+    start, end = report_range(report_type, start_date, end_date)
     conn = get_db()
-    c = conn.cursor()
+    report = session_summary.funnel_report(conn.cursor(), str, start, end)
+    conn.close()
+    return {"period": report_type, **report}
+
+
+def _report_rows(c, schema, start, end):
+    """Run the report aggregates against one attached schema."""
+    rows = {}
+    c.execute(
+        f"SELECT was_answered, COUNT(*) as cnt FROM {schema}.queries WHERE created_at BETWEEN ? AND ? GROUP BY was_answered",
+        (start, end),
+    )
+    rows["answers"] = [(row["was_answered"], row["cnt"]) for row in c.fetchall()]
+    c.execute(
+        f"SELECT category, COUNT(*) as cnt FROM {schema}.queries WHERE created_at BETWEEN ? AND ? GROUP BY category",
+        (start, end),
+    )
+    rows["categories"] = [(row["category"] or "Uncategorized", row["cnt"]) for row in c.fetchall()]
+    c.execute(
+        f"SELECT rating, COUNT(*) as cnt FROM {schema}.feedback WHERE created_at BETWEEN ? AND ? GROUP BY rating",
+        (start, end),
+    )
+    rows["feedback"] = [(row["rating"], row["cnt"]) for row in c.fetchall()]
+    c.execute(
+        f"SELECT query_type, COUNT(*) as cnt FROM {schema}.api_queries WHERE created_at BETWEEN ? AND ? GROUP BY query_type",
+        (start, end),
+    )
+    rows["api"] = [(row["query_type"], row["cnt"]) for row in c.fetchall()]
+    c.execute(
+        f"SELECT user_message, bot_response, category, was_answered, created_at FROM {schema}.queries WHERE created_at BETWEEN ? AND ? ORDER BY created_at DESC LIMIT 50",
+        (start, end),
+    )
+    rows["recent"] = [dict(row) for row in c.fetchall()]
+    return rows
 
+
+def report_range(report_type, start_date=None, end_date=None):
+    """Return the (start, end) timestamps covered by a report period."""
     now = datetime.now()
     if report_type == "today":
         start = now.strftime("%Y-%m-%d 00:00:00")
@@ -127,51 +662,49 @@ def get_report(report_type, start_date=None, end_date=None):
     else:
         start = "2000-01-01 00:00:00"
         end = now.strftime("%Y-%m-%d 23:59:59")
+    return start, end
 
-    # Total queries
-    c.execute(
-        "SELECT COUNT(*) as total FROM queries WHERE created_at BETWEEN ? AND ?",
-        (start, end),
-    )
-    total = c.fetchone()["total"]
-
-    # Answered vs not answered
-    c.execute(
-        "SELECT was_answered, COUNT(*) as cnt FROM queries WHERE created_at BETWEEN ? AND ? GROUP BY was_answered",
-        (start, end),
-    )
-    answer_stats = {row["was_answered"]: row["cnt"] for row in c.fetchall()}
 
-    # Category-wise breakdown
-    c.execute(
-        "SELECT category, COUNT(*) as cnt FROM queries WHERE created_at BETWEEN ? AND ? GROUP BY category ORDER BY cnt DESC",
-        (start, end),
-    )
-    categories = [{"category": row["category"] or "Uncategorized", "count": row["cnt"]} for row in c.fetchall()]
+def get_report(report_type, start_date=None, end_date=None):
+    conn = get_db()
+    c = conn.cursor()
+    start, end = report_range(report_type, start_date, end_date)
 
-    # Feedback summary
-    c.execute(
-        "SELECT rating, COUNT(*) as cnt FROM feedback WHERE created_at BETWEEN ? AND ? GROUP BY rating ORDER BY cnt DESC",
-        (start, end),
-    )
-    feedback_stats = [{"rating": row["rating"], "count": row["cnt"]} for row in c.fetchall()]
+    # Attach only the partitions that overlap the requested range
+    months = [m for m in partition_months() if start[:7] <= m <= end[:7]]
+    answer_stats, categories, feedback_stats, api_stats = Counter(), Counter(), Counter(), Counter()
+    recent = []
 
-    # API query stats
-    c.execute(
-        "SELECT query_type, COUNT(*) as cnt FROM api_queries WHERE created_at BETWEEN ? AND ? GROUP BY query_type ORDER BY cnt DESC",
-        (start, end),
-    )
-    api_stats = [{"type": row["query_type"], "count": row["cnt"]} for row in c.fetchall()]
+    groups = [[("main", None)]]
+    for k in range(0, len(months), ATTACH_BATCH):
+        groups.append([(f"p{n}", partition_path(m)) for n, m in enumerate(months[k:k + ATTACH_BATCH])])
 
-    # Recent queries
-    c.execute(
-        "SELECT user_message, bot_response, category, was_answered, created_at FROM queries WHERE created_at BETWEEN ? AND ? ORDER BY created_at DESC LIMIT 50",
-        (start, end),
-    )
-    recent = [dict(row) for row in c.fetchall()]
+    for group in groups:
+        attached = []
+        try:
+            for schema, path in group:
+                if path:
+                    c.execute(f"ATTACH DATABASE ? AS {schema}", (path,))
+                    attached.append(schema)
+            for schema, _ in group:
+                rows = _report_rows(c, schema, start, end)
+                for counter, key in ((answer_stats, "answers"), (categories, "categories"), (feedback_stats, "feedback"), (api_stats, "api")):
+                    for name, count in rows[key]:
+                        counter[name] += count
+                recent.extend(rows["recent"])
+        finally:
+            for schema in attached:
+                c.execute(f"DETACH DATABASE {schema}")
 
     conn.close()
 
+    recent.sort(key=lambda row: row["created_at"], reverse=True)
+    total = sum(answer_stats.values())
+    categories = [{"category": k, "count": v} for k, v in categories.most_common()]
+    feedback_stats = [{"rating": k, "count": v} for k, v in feedback_stats.most_common()]
+    api_stats = [{"type": k, "count": v} for k, v in api_stats.most_common()]
+    recent = recent[:50]
+
     return {
         "period": report_type,
         "start": start,
@@ -184,3 +717,49 @@ def get_report(report_type, start_date=None, end_date=None):
         "api_queries": api_stats,
         "recent_queries": recent,
     }
+
+
+def live_delta_rows(cur, sql, after_ids, since, settle_seconds=0):
+    """
+    Counts of rows logged at or after `since` with ids above after_ids[table],
+    in the live counter delta format, plus the highest id seen per table.
+    Counts and ids come from the same statement, so polling again from the
+    returned ids never counts a row twice. With settle_seconds, rows newer
+    than that are left for a later poll, as in session_summary.catch_up().
+    """
+    delta = {"total_queries": 0, "answered": 0, "not_answered": 0, "categories": {}, "feedback": {}, "api_queries": {}}
+    ids = dict(after_ids)
+    statements = (
+        ("queries", "was_answered, category"),
+        ("feedback", "rating"),
+        ("api_queries", "query_type"),
+    )
+    settled, params = "", ()
+    if settle_seconds:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)
+        settled, params = " AND created_at <= ?", (cutoff.strftime("%Y-%m-%d %H:%M:%S"),)
+    for table, columns in statements:
+        cur.execute(
+            sql(f"SELECT {columns}, COUNT(*), MAX(id) FROM {table} WHERE id > ? AND created_at >= ?{settled} GROUP BY {columns}"),
+            (after_ids.get(table, 0), since) + params,
+        )
+        for row in cur.fetchall():
+            *keys, count, max_id = row
+            ids[table] = max(ids.get(table, 0), max_id)
+            if table == "queries":
+                was_answered, category = keys
+                delta["total_queries"] += count
+                delta["answered" if was_answered else "not_answered"] += count
+                category = category or "Uncategorized"
+                delta["categories"][category] = delta["categories"].get(category, 0) + count
+            else:
+                delta[table][keys[0]] = delta[table].get(keys[0], 0) + count
+    return delta, ids
+
+
+def live_delta(after_ids, since):
+    conn = get_db()
+    try:
+        return live_delta_rows(conn.cursor(), str, after_ids, since)
+    finally:
+        conn.close()
@@ -0,0 +1,286 @@
+"""
+Offline job that mines unanswered chat queries for missing FAQs.
+
+    python faq_miner.py [--start 2026-01-01] [--end 2026-03-31] [--top 20] [--json] [--reset]
+
+Each run reads only the unanswered queries above the id watermark saved by
+the previous run over the same --start/--end range, turns them into hashed
+character n-gram vectors and adds them to the clusters built so far, starting
+new clusters for messages that match none. Every range keeps its own state
+file, so a run over one month does not move the watermark of the full run.
+When there are more than MAX_CLUSTERS clusters the smallest, least recently
+extended ones are dropped. It then prints the clusters ranked by size, each
+with representative messages and candidate keywords for a new FAQ.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from storage import create_storage_from_env
+
+STATE_PATH = os.environ.get("CKYC_MINER_STATE", os.path.join(os.path.dirname(__file__), "faq_miner_state.npz"))
+
+DIMENSIONS = 2 ** 12
+NGRAM_SIZES = (3, 4, 5)
+SIMILARITY_THRESHOLD = 0.45
+BATCH_SIZE = 500
+MAX_EXAMPLES = 5
+MAX_WORDS = 200
+# Each cluster holds a DIMENSIONS-wide centroid (16 KB); noise beyond this many is dropped
+MAX_CLUSTERS = 2000
+
+WORD_RE = re.compile(r"[\w\u0900-\u097F]+")
+
+STOPWORDS = {
+    "the", "and", "for", "are", "was", "what", "how", "why", "when", "where", "who", "which",
+    "can", "could", "will", "would", "should", "does", "did", "have", "has", "had", "this",
+    "that", "with", "from", "your", "you", "not", "but", "about", "please", "there", "their",
+    "sir", "madam", "urgent", "kindly", "help",
+    "है", "क्या", "का", "की", "के", "में", "कैसे", "और", "को", "से", "पर", "हैं", "मैं", "मेरा", "मेरी",
+}
+
+
+def state_path_for(start=None, end=None, base=STATE_PATH):
+    """State file for a --start/--end range; the full range uses `base` itself."""
+    if not start and not end:
+        return base
+    root, ext = os.path.splitext(base)
+    return f"{root}_{(start or 'first')[:10]}_{(end or 'last')[:10]}{ext}"
+
+
+def normalize(text):
+    return " " + " ".join(text.lower().split()) + " "
+
+
+def vectorize(messages):
+    """Signed hashed character n-gram counts, one L2-normalized row per message."""
+    rows, cols, signs = [], [], []
+    for i, message in enumerate(messages):
+        text = normalize(message)
+        for n in NGRAM_SIZES:
+            for j in range(len(text) - n + 1):
+                h = zlib.crc32(text[j:j + n].encode("utf-8"))
+                rows.append(i)
+                cols.append(h % DIMENSIONS)
+                signs.append(-1.0 if h & 0x80000000 else 1.0)
+
+    vectors = np.zeros((len(messages), DIMENSIONS), dtype=np.float32)
+    np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), np.array(signs, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def keywords_of(message):
+    return [w for w in WORD_RE.findall(message.lower()) if len(w) > 2 and w not in STOPWORDS and not w.isdigit()]
+
+
+class Clusters:
+    """Incrementally built clusters: centroid sums plus per-cluster examples and word counts."""
+
+    def __init__(self, start=None, end=None):
+        self.start = start
+        self.end = end
+        self.sums = np.zeros((0, DIMENSIONS), dtype=np.float32)
+        self.counts = np.zeros(0, dtype=np.int64)
+        # Highest query id added to each cluster, to tell stale clusters apart
+        self.updated = np.zeros(0, dtype=np.int64)
+        self.examples = []
+        self.words = []
+        self.watermark = 0
+        self.dropped = 0
+
+    @classmethod
+    def load(cls, path, start=None, end=None):
+        clusters = cls(start, end)
+        if not os.path.exists(path):
+            return clusters
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta["dimensions"] != DIMENSIONS:
+                raise ValueError(f"{path} was built with {meta['dimensions']} dimensions; rerun with --reset")
+            if (meta.get("start"), meta.get("end")) != (start, end):
+                raise ValueError(
+                    f"{path} was built for {meta.get('start') or 'the first'} to {meta.get('end') or 'the last'} query; "
+                    "use its own --state file or --reset"
+                )
+            clusters.sums = data["sums"]
+            clusters.counts = data["counts"]
+            clusters.updated = data["updated"] if "updated" in data.files else np.zeros(len(clusters.counts), dtype=np.int64)
+        clusters.examples = meta["examples"]
+        clusters.words = [Counter(w) for w in meta["words"]]
+        clusters.watermark = meta["watermark"]
+        clusters.dropped = meta.get("dropped", 0)
+        return clusters
+
+    def save(self, path):
+        meta = {
+            "dimensions": DIMENSIONS,
+            "start": self.start,
+            "end": self.end,
+            "watermark": self.watermark,
+            "dropped": self.dropped,
+            "examples": self.examples,
+            "words": [dict(w) for w in self.words],
+        }
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path, sums=self.sums, counts=self.counts, updated=self.updated,
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+        os.replace(tmp_path, path)
+
+    def _centroids(self):
+        norms = np.linalg.norm(self.sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return self.sums / norms
+
+    def add_batch(self, rows):
+        ids = [row[0] for row in rows]
+        messages = [row[1] for row in rows]
+        vectors = vectorize(messages)
+
+        # Assign to the most similar existing cluster when close enough
+        assigned = np.full(len(rows), -1, dtype=np.intp)
+        if len(self.counts):
+            sims = vectors @ self._centroids().T
+            best = sims.argmax(axis=1)
+            close = sims[np.arange(len(rows)), best] >= SIMILARITY_THRESHOLD
+            assigned[close] = best[close]
+
+        # The rest start new clusters, greedily grouped with each other
+        first_new = len(self.counts)
+        leaders = []
+        for i in np.flatnonzero(assigned < 0):
+            if leaders:
+                sims = vectors[leaders] @ vectors[i]
+                k = int(sims.argmax())
+                if sims[k] >= SIMILARITY_THRESHOLD:
+                    assigned[i] = first_new + k
+                    continue
+            assigned[i] = first_new + len(leaders)
+            leaders.append(i)
+
+        if leaders:
+            self.sums = np.vstack([self.sums, np.zeros((len(leaders), DIMENSIONS), dtype=np.float32)])
+            self.counts = np.concatenate([self.counts, np.zeros(len(leaders), dtype=np.int64)])
+            self.updated = np.concatenate([self.updated, np.zeros(len(leaders), dtype=np.int64)])
+            self.examples.extend([] for _ in leaders)
+            self.words.extend(Counter() for _ in leaders)
+
+        np.add.at(self.sums, assigned, vectors)
+        self.counts += np.bincount(assigned, minlength=len(self.counts))
+        np.maximum.at(self.updated, assigned, np.array(ids, dtype=np.int64))
+
+        # Similarity of each message to its cluster's updated centroid picks the examples
+        own = self._centroids()[assigned]
+        scores = np.einsum("ij,ij->i", vectors, own)
+        touched = set()
+        for cluster, score, message in zip(assigned.tolist(), scores.tolist(), messages):
+            touched.add(cluster)
+            self.words[cluster].update(keywords_of(message))
+            examples = self.examples[cluster]
+            if any(e[1].lower() == message.lower() for e in examples):
+                continue
+            examples.append([round(score, 4), message])
+            examples.sort(key=lambda e: e[0], reverse=True)
+            del examples[MAX_EXAMPLES:]
+        for cluster in touched:
+            if len(self.words[cluster]) > MAX_WORDS * 2:
+                self.words[cluster] = Counter(dict(self.words[cluster].most_common(MAX_WORDS)))
+
+        self.watermark = max(self.watermark, max(ids))
+        self._prune()
+
+    def _prune(self):
+        """Drop the smallest, least recently extended clusters beyond MAX_CLUSTERS."""
+        excess = len(self.counts) - MAX_CLUSTERS
+        if excess <= 0:
+            return
+        # Go a tenth below the cap so pruning does not run on every batch
+        drop = np.lexsort((self.updated, self.counts))[:excess + MAX_CLUSTERS // 10]
+        keep = np.setdiff1d(np.arange(len(self.counts)), drop)
+        self.dropped += int(self.counts[drop].sum())
+        self.sums = self.sums[keep]
+        self.counts = self.counts[keep]
+        self.updated = self.updated[keep]
+        self.examples = [self.examples[i] for i in keep.tolist()]
+        self.words = [self.words[i] for i in keep.tolist()]
+
+    def ranked(self, top=20, min_size=2):
+        """Clusters by size, with representative messages and candidate keywords."""
+        doc_freq = Counter()
+        for words in self.words:
+            doc_freq.update(words.keys())
+        total = max(1, len(self.words))
+
+        result = []
+        for cluster in np.argsort(-self.counts, kind="stable")[:top].tolist():
+            size = int(self.counts[cluster])
+            if size < min_size:
+                break
+            scored = {w: c * math.log(1 + total / doc_freq[w]) for w, c in self.words[cluster].items()}
+            keywords = sorted(scored, key=scored.get, reverse=True)[:8]
+            result.append({
+                "cluster": cluster,
+                "size": size,
+                "examples": [e[1] for e in self.examples[cluster]],
+                "keywords": keywords,
+            })
+        return result
+
+
+def mine(storage, state_path=None, start=None, end=None, reset=False):
+    """
+    Add unanswered queries in [start, end] above the range's watermark to its
+    saved clusters. Returns (clusters, new rows).
+    """
+    state_path = state_path or state_path_for(start, end)
+    clusters = Clusters(start, end) if reset else Clusters.load(state_path, start, end)
+    processed = 0
+    batch = []
+    for row in storage.iter_unanswered_queries(clusters.watermark, start, end, BATCH_SIZE):
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            clusters.add_batch(batch)
+            processed += len(batch)
+            batch = []
+    if batch:
+        clusters.add_batch(batch)
+        processed += len(batch)
+    clusters.save(state_path)
+    return clusters, processed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Suggest new FAQs from unanswered chat queries")
+    parser.add_argument("--start", help="first day to include, YYYY-MM-DD")
+    parser.add_argument("--end", help="last day to include, YYYY-MM-DD")
+    parser.add_argument("--top", type=int, default=20, help="number of clusters to show")
+    parser.add_argument("--min-size", type=int, default=2, help="smallest cluster worth showing")
+    parser.add_argument("--state", help="where clusters and the watermark are kept (default: one file per range)")
+    parser.add_argument("--reset", action="store_true", help="discard saved clusters and start from the first row")
+    parser.add_argument("--json", action="store_true", help="print the ranking as JSON")
+    args = parser.parse_args()
+
+    start = f"{args.start} 00:00:00" if args.start else None
+    end = f"{args.end} 23:59:59" if args.end else None
+    clusters, processed = mine(create_storage_from_env(), args.state, start, end, args.reset)
+    ranking = clusters.ranked(args.top, args.min_size)
+
+    if args.json:
+        print(json.dumps({"processed": processed, "watermark": clusters.watermark, "dropped": clusters.dropped, "clusters": ranking}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Processed {processed} new unanswered queries (watermark id {clusters.watermark}), {len(clusters.counts)} clusters")
+        if clusters.dropped:
+            print(f"{clusters.dropped} queries in small, stale clusters were dropped to stay under {MAX_CLUSTERS} clusters")
+        for rank, item in enumerate(ranking, 1):
+            print(f"\n#{rank}  {item['size']} queries  keywords: {', '.join(item['keywords']) or '-'}")
+            for example in item["examples"]:
+                print(f"    - {example}")
@@ -270,6 +270,20 @@ FAQS = [
 GREETINGS = ["hello", "hi", "hey", "namaste", "good morning", "good afternoon", "good evening", "greetings", "नमस्ते", "नमस्कार"]
 
 
+# (faq, lowercased keywords, best possible score), built once by build_index()
+_FAQ_INDEX = None
+
+
+def build_index():
+    """Precompute lowercased keywords and score denominators for every FAQ."""
+    global _FAQ_INDEX
+    _FAQ_INDEX = [
+        (faq, tuple(keyword.lower() for keyword in faq["keywords"]), len(faq["keywords"]) * 2)
+        for faq in FAQS
+    ]
+    return _FAQ_INDEX
+
+
 def find_best_match(user_message, lang="en"):
     """
     Find the best FAQ match based on keyword matching.
@@ -284,14 +298,12 @@ def find_best_match(user_message, lang="en"):
 
     best_match = None
     best_score = 0
+    words = set(message_lower.split())
 
-    for faq in FAQS:
+    for faq, keywords, max_score in _FAQ_INDEX or build_index():
         score = 0
-        keywords = faq["keywords"]
-        words = message_lower.split()
 
-        for keyword in keywords:
-            keyword_lower = keyword.lower()
+        for keyword_lower in keywords:
             # Exact word match gets higher score
             if keyword_lower in words:
                 score += 2
@@ -300,8 +312,8 @@ def find_best_match(user_message, lang="en"):
                 score += 1
 
         # Normalize score by number of keywords
-        if keywords:
-            normalized_score = score / (len(keywords) * 2)
+        if max_score:
+            normalized_score = score / max_score
         else:
             normalized_score = 0
 
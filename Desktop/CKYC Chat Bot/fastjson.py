@@ -0,0 +1,44 @@
+"""
+Flask JSON provider that uses orjson when it is installed and the standard
+library otherwise. Both paths write UTF-8 directly instead of \\uXXXX escapes,
+which alone makes Devanagari responses about half the size.
+"""
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+except ImportError:
+    orjson = None
+
+
+def _orjson_default(obj):
+    # orjson handles datetime and UUID itself; defer the rest to Flask's rules
+    return DefaultJSONProvider.default(obj)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS).decode("utf-8")
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        # Same argument rules as jsonify(): one value, several as a list, or keywords as an object
+        if args and kwargs:
+            raise TypeError("app.json.response() takes either args or kwargs, not both")
+        obj = args[0] if len(args) == 1 else (args or kwargs or None)
+        if orjson is not None:
+            body = orjson.dumps(obj, default=_orjson_default, option=ORJSON_OPTIONS)
+        else:
+            body = super().dumps(obj, separators=(",", ":")).encode("utf-8")
+        return self._app.response_class(body, mimetype=self.mimetype)
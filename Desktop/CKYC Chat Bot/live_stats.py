@@ -0,0 +1,160 @@
+"""
+In-memory running counters for today's traffic, pushed to admin dashboards
+over server-sent events.
+
+Counters are built by polling the log tables for rows above the last id seen,
+so every worker's dashboards see the traffic of all workers and nodes sharing
+the database. The poller runs only while a dashboard is connected, and each
+poll is a few indexed queries however many dashboards there are. Counters are
+rebuilt from the start of the day every `resync_interval` seconds and when the
+day changes. On a server database rows appear once they are older than the
+storage's settle window, so rows committed out of id order are not skipped.
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import date
+from queue import Empty, Full, Queue
+
+from database import report_range
+
+logger = logging.getLogger(__name__)
+
+class LiveStats:
+    def __init__(self, source, poll_interval=1.0, resync_interval=300, heartbeat=15, max_backlog=1000):
+        # source(after_ids, since) -> (delta, ids), e.g. Storage.live_delta
+        self._source = source
+        self.poll_interval = poll_interval
+        self.resync_interval = resync_interval
+        self.heartbeat = heartbeat
+        self.max_backlog = max_backlog
+        self._lock = threading.Lock()
+        # Serializes seed() and poll() so counters and ids always move together
+        self._sync_lock = threading.Lock()
+        self._subscribers = set()
+        self._poller = None
+        self._seeded_at = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._day = date.today()
+        self._since = report_range("today")[0]
+        self._ids = {}
+        self._totals = Counter()
+        self._categories = Counter()
+        self._feedback = Counter()
+        self._api = Counter()
+
+    def _apply(self, delta):
+        for key in ("total_queries", "answered", "not_answered"):
+            self._totals[key] += delta.get(key, 0)
+        self._categories.update(delta.get("categories", {}))
+        self._feedback.update(delta.get("feedback", {}))
+        self._api.update(delta.get("api_queries", {}))
+
+    def seed(self):
+        """Rebuild the counters from every row logged today."""
+        with self._sync_lock:
+            day, since = date.today(), report_range("today")[0]
+            delta, ids = self._source({}, since)
+            with self._lock:
+                self._reset()
+                self._day, self._since, self._ids = day, since, ids
+                self._apply(delta)
+                self._seeded_at = time.monotonic()
+                self._publish("snapshot", self._snapshot())
+
+    def poll(self):
+        """Apply rows logged since the last poll and push them to dashboards."""
+        if self._day != date.today() or time.monotonic() - self._seeded_at > self.resync_interval:
+            self.seed()
+            return
+        with self._sync_lock:
+            delta, ids = self._source(self._ids, self._since)
+            with self._lock:
+                self._ids = ids
+                self._apply(delta)
+                if delta["total_queries"] or delta["feedback"] or delta["api_queries"]:
+                    self._publish("delta", delta)
+
+    def _publish(self, event, data):
+        # Called with self._lock held, so no dashboard gets a delta its snapshot already includes
+        for queue in self._subscribers:
+            try:
+                queue.put_nowait((event, data))
+            except Full:
+                # A dashboard that cannot keep up gets a fresh snapshot instead of the backlog
+                with queue.mutex:
+                    queue.queue.clear()
+                queue.put_nowait(("snapshot", self._snapshot()))
+
+    def _poll_loop(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+            try:
+                self.poll()
+            except Exception:
+                # Keep serving the last counters; the next poll or resync catches up
+                logger.exception("Polling live counters failed")
+
+    def snapshot(self):
+        if self._day != date.today():
+            self.seed()
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        return {
+            "day": self._day.isoformat(),
+            "total_queries": self._totals["total_queries"],
+            "answered": self._totals["answered"],
+            "not_answered": self._totals["not_answered"],
+            "categories": dict(self._categories),
+            "feedback": dict(self._feedback),
+            "api_queries": dict(self._api),
+        }
+
+    def subscribe(self):
+        if self._day != date.today():
+            self.seed()
+        queue = Queue(maxsize=self.max_backlog)
+        with self._lock:
+            queue.put_nowait(("snapshot", self._snapshot()))
+            self._subscribers.add(queue)
+            start_poller = self._poller is None
+            if start_poller:
+                self._poller = threading.Thread(target=self._poll_loop, name="live-stats-poll", daemon=True)
+        if start_poller:
+            self._poller.start()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.discard(queue)
+
+    def stream(self, queue):
+        """Server-sent events for one subscriber: a snapshot, then deltas."""
+        try:
+            while True:
+                try:
+                    event, data = queue.get(timeout=self.heartbeat)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _sse(event, data)
+        finally:
+            self.unsubscribe(queue)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}\n\n"
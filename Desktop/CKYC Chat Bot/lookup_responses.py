@@ -0,0 +1,133 @@
+"""
+Response templates for the registry lookup endpoints, keyed by
+endpoint -> option -> language. Options are the status code for
+status_check and mismatch_check and the menu number for wallet_inquiry.
+
+Templates are compiled once at import into a flat table keyed by
+(endpoint, option, language), with the English fallback already resolved for
+every known language, so a request costs one lookup and one format.
+"""
+from string import Formatter
+
+from translations import TRANSLATIONS
+
+LOOKUP_RESPONSES = {
+    "status_check": {
+        "under_processing": {
+            "en": "Registration/Acknowledgment Number: {reg_number}\nStatus: Under Processing\nSubmitted on: {submitted_on}\nExpected completion: {expected_completion} working days",
+            "hi": "पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: प्रसंस्करण के अंतर्गत\nजमा करने की तिथि: {submitted_on}\nअपेक्षित पूर्णता: {expected_completion} कार्य दिवस",
+        },
+        "accepted": {
+            "en": "Registration/Acknowledgment Number: {reg_number}\nStatus: Accepted\nCKYC Number has been generated successfully.",
+            "hi": "पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: स्वीकृत\nCKYC नंबर सफलतापूर्वक जनरेट हो गया है।",
+        },
+        "pending_verification": {
+            "en": "Registration/Acknowledgment Number: {reg_number}\nStatus: Pending Verification\nYour documents are under review.",
+            "hi": "पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: सत्यापन लंबित\nआपके दस्तावेज़ समीक्षाधीन हैं।",
+        },
+        "other": {
+            "en": "Registration/Acknowledgment Number: {reg_number}\nStatus: {status}",
+            "hi": "पंजीकरण/पावती संख्या: {reg_number}\nस्थिति: {status}",
+        },
+    },
+    "wallet_inquiry": {
+        1: {
+            "en": "RE Number: {re_number}\nAvailable Balance: ₹{available_balance}\nLast Transaction: {last_transaction}",
+            "hi": "RE नंबर: {re_number}\nउपलब्ध शेष: ₹{available_balance}\nअंतिम लेनदेन: {last_transaction}",
+        },
+        2: {
+            "en": "RE Number: {re_number}\nTDS on Hold: ₹{tds_on_hold}\nFinancial Year: {financial_year}",
+            "hi": "RE नंबर: {re_number}\nहोल्ड पर TDS: ₹{tds_on_hold}\nवित्तीय वर्ष: {financial_year}",
+        },
+        3: {
+            "en": "RE Number: {re_number}\nThreshold Limit: ₹{threshold_limit}\nCurrent Usage: ₹{current_usage}",
+            "hi": "RE नंबर: {re_number}\nसीमा सीमा: ₹{threshold_limit}\nवर्तमान उपयोग: ₹{current_usage}",
+        },
+        4: {
+            "en": "RE Number: {re_number}\nMinimum Balance Limit: ₹{minimum_balance_limit}\nCurrent Balance: ₹{current_balance}",
+            "hi": "RE नंबर: {re_number}\nन्यूनतम शेष सीमा: ₹{minimum_balance_limit}\nवर्तमान शेष: ₹{current_balance}",
+        },
+    },
+    "mismatch_check": {
+        "active": {
+            "en": "CKYC Number: {ckyc_number}\nRegistered Financial Institution: {institution}\nLast Updated: {last_updated}\nStatus: Active\n\nIf you find any mismatch, please contact your Financial Institution to initiate the correction process.",
+            "hi": "CKYC नंबर: {ckyc_number}\nपंजीकृत वित्तीय संस्थान: {institution}\nअंतिम अपडेट: {last_updated}\nस्थिति: सक्रिय\n\nयदि आपको कोई बेमेल मिलता है, तो कृपया सुधार प्रक्रिया शुरू करने के लिए अपने वित्तीय संस्थान से संपर्क करें।",
+        },
+        "inactive": {
+            "en": "CKYC Number: {ckyc_number}\nRegistered Financial Institution: {institution}\nLast Updated: {last_updated}\nStatus: Inactive\n\nPlease contact your Financial Institution to reactivate your CKYC record.",
+            "hi": "CKYC नंबर: {ckyc_number}\nपंजीकृत वित्तीय संस्थान: {institution}\nअंतिम अपडेट: {last_updated}\nस्थिति: निष्क्रिय\n\nअपना CKYC रिकॉर्ड पुनः सक्रिय करने के लिए कृपया अपने वित्तीय संस्थान से संपर्क करें।",
+        },
+        "closed": {
+            "en": "CKYC Number: {ckyc_number}\nRegistered Financial Institution: {institution}\nLast Updated: {last_updated}\nStatus: Closed\n\nThis CKYC record has been closed. Please contact your Financial Institution for details.",
+            "hi": "CKYC नंबर: {ckyc_number}\nपंजीकृत वित्तीय संस्थान: {institution}\nअंतिम अपडेट: {last_updated}\nस्थिति: बंद\n\nयह CKYC रिकॉर्ड बंद कर दिया गया है। विवरण के लिए कृपया अपने वित्तीय संस्थान से संपर्क करें।",
+        },
+        "other": {
+            "en": "CKYC Number: {ckyc_number}\nRegistered Financial Institution: {institution}\nLast Updated: {last_updated}\nStatus: {status}\n\nPlease contact your Financial Institution for details.",
+            "hi": "CKYC नंबर: {ckyc_number}\nपंजीकृत वित्तीय संस्थान: {institution}\nअंतिम अपडेट: {last_updated}\nस्थिति: {status}\n\nविवरण के लिए कृपया अपने वित्तीय संस्थान से संपर्क करें।",
+        },
+    },
+}
+
+# Option used when the registry returns one we have no template for; the
+# "other" templates show the registry's status as given
+DEFAULT_OPTIONS = {
+    "status_check": "other",
+    "wallet_inquiry": 1,
+    "mismatch_check": "other",
+}
+
+# Registry institution names, which are in English, per language
+INSTITUTION_NAMES = {
+    "State Bank of India": {"hi": "भारतीय स्टेट बैंक"},
+    "Punjab National Bank": {"hi": "पंजाब नेशनल बैंक"},
+    "Bank of Baroda": {"hi": "बैंक ऑफ़ बड़ौदा"},
+    "Bank of India": {"hi": "बैंक ऑफ़ इंडिया"},
+    "Canara Bank": {"hi": "केनरा बैंक"},
+    "Union Bank of India": {"hi": "यूनियन बैंक ऑफ़ इंडिया"},
+    "Central Bank of India": {"hi": "सेंट्रल बैंक ऑफ़ इंडिया"},
+    "Indian Bank": {"hi": "इंडियन बैंक"},
+}
+
+
+def _languages():
+    langs = {"en"}
+    for entry in TRANSLATIONS.values():
+        langs.update(entry)
+    for options in LOOKUP_RESPONSES.values():
+        for templates in options.values():
+            langs.update(templates)
+    return langs
+
+
+def _compile():
+    compiled = {}
+    formatter = Formatter()
+    for endpoint, options in LOOKUP_RESPONSES.items():
+        for option, templates in options.items():
+            expected = {f for _, f, _, _ in formatter.parse(templates["en"]) if f}
+            for lang, template in templates.items():
+                fields = {f for _, f, _, _ in formatter.parse(template) if f}
+                if fields != expected:
+                    raise ValueError(f"{endpoint}/{option}/{lang} uses fields {sorted(fields)}, expected {sorted(expected)}")
+            for lang in LANGUAGES:
+                compiled[(endpoint, option, lang)] = templates.get(lang, templates["en"]).format_map
+    return compiled
+
+
+LANGUAGES = frozenset(_languages())
+_COMPILED = _compile()
+
+
+def institution_name(name, lang):
+    """The institution's name in lang, or as the registry gave it if we have no translation."""
+    return INSTITUTION_NAMES.get(name, {}).get(lang, name)
+
+
+def render(endpoint, option, lang, fields):
+    """Format the response for one (endpoint, option, language) from a dict of fields."""
+    template = _COMPILED.get((endpoint, option, lang))
+    if template is None:
+        if lang not in LANGUAGES:
+            lang = "en"
+        template = _COMPILED.get((endpoint, option, lang)) or _COMPILED[(endpoint, DEFAULT_OPTIONS[endpoint], lang)]
+    return template(fields)
@@ -0,0 +1,35 @@
+"""
+Log storage maintenance, meant to run daily from cron or a scheduler:
+
+    python maintenance.py [--vacuum]
+
+Folds new log rows into the session summary and prunes sessions older than
+the hot window from it, moves closed months from the hot database into
+monthly partition files, archives and expires old partitions, and runs an
+incremental vacuum.
+
+--vacuum first rewrites the whole database with a full VACUUM, which
+switches a database created before incremental auto-vacuum to it and
+reclaims the space freed by normalizing responses. It locks the database
+for the duration, so run it only while the app is stopped.
+"""
+import argparse
+
+from database import init_db, run_maintenance, vacuum_db
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize, partition, archive and vacuum the chat logs")
+    parser.add_argument("--vacuum", action="store_true", help="full VACUUM first; run only while the app is stopped")
+    args = parser.parse_args()
+
+    init_db()
+    if args.vacuum:
+        vacuum_db()
+        print("Vacuumed: database rewritten with incremental auto-vacuum")
+    result = run_maintenance()
+    print(f"Sessions summarized: {result['summarized']}")
+    print(f"Sessions pruned from the summary: {result['pruned']}")
+    print(f"Rolled into partitions: {', '.join(result['rolled']) or 'none'}")
+    print(f"Archived: {', '.join(result['archived']) or 'none'}")
+    print(f"Deleted archives: {', '.join(result['deleted']) or 'none'}")
@@ -0,0 +1,242 @@
+"""
+Token-bucket rate limiting and concurrency-based load shedding for the API.
+
+Buckets live in a pluggable store:
+    MemoryStore    per-process dict (default, single worker)
+    SQLiteStore    shared SQLite file, for several workers on one host
+    SocketStore    client for a bucket server on a local Unix socket, started with
+                   `python ratelimit.py serve --socket /tmp/ckyc-ratelimit.sock`
+
+Configuration (environment):
+    CKYC_RATE_LIMIT_STORE   memory | sqlite:<path> | socket:<path> (default memory)
+    CKYC_SESSION_RATE       tokens per second per session (default 2)
+    CKYC_SESSION_BURST      bucket size per session (default 20)
+    CKYC_IP_RATE            tokens per second per client IP (default 10)
+    CKYC_IP_BURST           bucket size per client IP (default 100)
+    CKYC_MAX_IN_FLIGHT      concurrent API requests before shedding (default 64)
+    CKYC_TRUSTED_PROXIES    reverse proxies in front of the app whose X-Forwarded-For
+                            is trusted for the client IP (default 0: use the peer address)
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+
+# Buckets idle this long are full again for any sane rule, so they can be dropped
+PRUNE_AFTER = 3600
+PRUNE_EVERY = 1000
+
+
+def take_token(tokens, updated_at, now, rate, capacity, cost=1.0):
+    """Refill a bucket and try to take `cost` tokens. Returns (allowed, tokens, retry_after)."""
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * rate)
+    if tokens >= cost:
+        return True, tokens - cost, 0.0
+    return False, tokens, (cost - tokens) / rate
+
+
+class MemoryStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._ops = 0
+
+    def take(self, key, rate, capacity, cost=1.0):
+        now = time.time()
+        with self._lock:
+            tokens, updated_at = self._buckets.get(key, (capacity, now))
+            allowed, tokens, retry_after = take_token(tokens, updated_at, now, rate, capacity, cost)
+            self._buckets[key] = (tokens, now)
+            self._ops += 1
+            if self._ops % PRUNE_EVERY == 0:
+                cutoff = now - PRUNE_AFTER
+                self._buckets = {k: v for k, v in self._buckets.items() if v[1] >= cutoff}
+        return allowed, retry_after
+
+
+class SQLiteStore:
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._ops = 0
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity, cost=1.0):
+        now = time.time()
+        conn = self._conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT tokens, updated_at FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated_at = row if row else (capacity, now)
+            allowed, tokens, retry_after = take_token(tokens, updated_at, now, rate, capacity, cost)
+            conn.execute(
+                "INSERT INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                (key, tokens, now),
+            )
+            self._ops += 1
+            if self._ops % PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM rate_buckets WHERE updated_at < ?", (now - PRUNE_AFTER,))
+            conn.execute("COMMIT")
+        except sqlite3.OperationalError:
+            # A locked or broken limiter store must not take the API down with it
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            return True, 0.0
+        return allowed, retry_after
+
+
+class SocketStore:
+    """Talks to `serve()` over a Unix socket; falls back to a local MemoryStore if it is down."""
+
+    def __init__(self, path, timeout=0.2):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._fallback = MemoryStore()
+
+    def _stream(self):
+        stream = getattr(self._local, "stream", None)
+        if stream is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            stream = sock.makefile("rwb")
+            self._local.stream = stream
+        return stream
+
+    def take(self, key, rate, capacity, cost=1.0):
+        request = {"key": key, "rate": rate, "capacity": capacity, "cost": cost}
+        try:
+            stream = self._stream()
+            stream.write(json.dumps(request).encode("utf-8") + b"\n")
+            stream.flush()
+            reply = json.loads(stream.readline())
+            return reply["allowed"], reply["retry_after"]
+        except (OSError, ValueError, KeyError):
+            stream = getattr(self._local, "stream", None)
+            if stream is not None:
+                stream.close()
+                self._local.stream = None
+            return self._fallback.take(key, rate, capacity, cost)
+
+
+class _BucketRequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                req = json.loads(line)
+                allowed, retry_after = self.server.store.take(req["key"], req["rate"], req["capacity"], req.get("cost", 1.0))
+            except (ValueError, KeyError):
+                return
+            self.wfile.write(json.dumps({"allowed": allowed, "retry_after": retry_after}).encode("utf-8") + b"\n")
+
+
+def serve(path):
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socketserver.ThreadingUnixStreamServer(path, _BucketRequestHandler)
+    server.daemon_threads = True
+    server.store = MemoryStore()
+    print(f"CKYC rate limit store listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.unlink(path)
+
+
+class RateLimiter:
+    """
+    Checks one bucket per identity kind, e.g. {"session": sid, "ip": addr}.
+    `rules` maps each kind to (tokens per second, burst size).
+    """
+
+    def __init__(self, store, rules):
+        self.store = store
+        self.rules = rules
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def check(self, identities):
+        """Return 0 if the request may proceed, else seconds until it may retry."""
+        for kind, value in identities.items():
+            if not value or kind not in self.rules:
+                continue
+            rate, burst = self.rules[kind]
+            allowed, retry_after = self.store.take(f"{kind}:{value}", rate, burst)
+            if not allowed:
+                with self._lock:
+                    self.limited += 1
+                return max(1, math.ceil(retry_after))
+        return 0
+
+
+class ConcurrencyLimiter:
+    """Non-blocking admission control: rejects work beyond `max_in_flight` instead of queueing it."""
+
+    def __init__(self, max_in_flight):
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.shed = 0
+
+    def try_acquire(self):
+        with self._lock:
+            if self.in_flight >= self.max_in_flight:
+                self.shed += 1
+                return False
+            self.in_flight += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+
+
+def create_store(spec):
+    if spec.startswith("sqlite:"):
+        return SQLiteStore(spec[len("sqlite:"):])
+    if spec.startswith("socket:"):
+        return SocketStore(spec[len("socket:"):])
+    return MemoryStore()
+
+
+def create_limiters_from_env():
+    store = create_store(os.environ.get("CKYC_RATE_LIMIT_STORE", "memory"))
+    rate_limiter = RateLimiter(store, {
+        "session": (float(os.environ.get("CKYC_SESSION_RATE", 2)), float(os.environ.get("CKYC_SESSION_BURST", 20))),
+        "ip": (float(os.environ.get("CKYC_IP_RATE", 10)), float(os.environ.get("CKYC_IP_BURST", 100))),
+    })
+    admission = ConcurrencyLimiter(int(os.environ.get("CKYC_MAX_IN_FLIGHT", 64)))
+    return rate_limiter, admission
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CKYC shared rate limit store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    serve_parser = sub.add_parser("serve", help="run the bucket server on a Unix socket")
+    serve_parser.add_argument("--socket", default="/tmp/ckyc-ratelimit.sock")
+    args = parser.parse_args()
+    serve(args.socket)
@@ -0,0 +1,304 @@
+"""
+Per-session summary table behind the funnel report.
+
+session_summary keeps one row per chat session: its language and user type,
+turns, first matched answer, helpdesk redirects and feedback. funnel_daily
+rolls those sessions up per day, user type and language. catch_up() folds in
+only the log rows above the id watermark saved for each source table and
+applies each touched session's change to the rollup. It runs in the
+background and from maintenance, never inside a report, and a funnel report
+over months reads a few hundred rollup rows instead of joining the raw logs.
+Sessions are pruned from session_summary once their logs leave the hot
+database, so the table stays as small as the hot window.
+
+Functions take a DB-API cursor plus `sql`, which rewrites "?" placeholders for
+the driver, and `dialect` ("sqlite" or "postgres"). Callers own the
+transaction: take LOCK before catch_up() and commit after each call.
+"""
+from datetime import datetime, timedelta, timezone
+
+from translations import TRANSLATIONS
+
+SOURCES = ("chat_sessions", "queries", "api_queries", "feedback")
+
+# Category logged with the reply to the third unmatched question, which
+# redirects the user to the helpdesk
+REDIRECT_CATEGORY = "Helpdesk Redirect"
+
+# Rows logged before redirects had a category are recognised by the reply
+# text, which only works while redirect_msg keeps its wording
+REDIRECT_RESPONSES = tuple(sorted(set(TRANSLATIONS["redirect_msg"].values())))
+
+# Log ids folded per source per transaction; keeps the write lock short
+CHUNK_SIZE = 2000
+
+# Seconds between catch-up transactions, so log writers waiting on the lock
+# get it before the next chunk takes it again
+CHUNK_PAUSE = 0.1
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS session_summary (
+        session_id TEXT PRIMARY KEY,
+        language TEXT,
+        user_type TEXT,
+        first_seen_at TIMESTAMP,
+        last_seen_at TIMESTAMP,
+        turns INTEGER NOT NULL DEFAULT 0,
+        answered INTEGER NOT NULL DEFAULT 0,
+        first_match_at TIMESTAMP,
+        redirects INTEGER NOT NULL DEFAULT 0,
+        api_calls INTEGER NOT NULL DEFAULT 0,
+        feedback_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_session_summary_first_seen_at ON session_summary (first_seen_at)",
+    """
+    CREATE TABLE IF NOT EXISTS funnel_daily (
+        day TEXT NOT NULL,
+        user_type TEXT NOT NULL,
+        language TEXT NOT NULL,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        chatted INTEGER NOT NULL DEFAULT 0,
+        turns INTEGER NOT NULL DEFAULT 0,
+        matched INTEGER NOT NULL DEFAULT 0,
+        seconds_to_first_match DOUBLE PRECISION NOT NULL DEFAULT 0,
+        redirected INTEGER NOT NULL DEFAULT 0,
+        gave_feedback INTEGER NOT NULL DEFAULT 0,
+        feedback_count INTEGER NOT NULL DEFAULT 0,
+        rating_sum INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, user_type, language)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS summary_watermarks (
+        source TEXT PRIMARY KEY,
+        last_id INTEGER NOT NULL
+    )
+    """,
+]
+
+# Statement that serializes concurrent catch-ups, run at the start of the transaction
+LOCK = {
+    "sqlite": "BEGIN IMMEDIATE",
+    "postgres": "LOCK TABLE summary_watermarks IN EXCLUSIVE MODE",
+}
+
+_LEAST = {"sqlite": "MIN", "postgres": "LEAST"}
+_GREATEST = {"sqlite": "MAX", "postgres": "GREATEST"}
+
+# funnel_daily counters, in column order
+COUNTS = ("sessions", "chatted", "turns", "matched", "seconds_to_first_match", "redirected", "gave_feedback", "feedback_count", "rating_sum")
+
+# Session ids per IN (...) lookup
+LOOKUP_BATCH = 500
+
+# Per source: the aggregate over an id range, one row per session, and the
+# summary columns it fills (after session_id)
+AGGREGATES = {
+    "chat_sessions": (
+        "SELECT s.session_id, s.language, s.user_type, a.first_seen, a.last_seen FROM chat_sessions s JOIN ("
+        "SELECT session_id, MAX(id) AS last_id, MIN(created_at) AS first_seen, MAX(created_at) AS last_seen "
+        "FROM chat_sessions WHERE id > ? AND id <= ? GROUP BY session_id) a ON s.id = a.last_id",
+        ("language", "user_type", "first_seen_at", "last_seen_at"),
+    ),
+    "queries": (
+        "SELECT session_id, MIN(created_at), MAX(created_at), COUNT(*), SUM(was_answered), "
+        "MIN(CASE WHEN was_answered = 1 AND (category IS NULL OR category <> 'Greeting') THEN created_at END), "
+        "SUM(CASE WHEN category = ? OR (category IS NULL AND "
+        f"bot_response IN ({', '.join('?' for _ in REDIRECT_RESPONSES)})) THEN 1 ELSE 0 END) "
+        "FROM queries WHERE id > ? AND id <= ? GROUP BY session_id",
+        ("first_seen_at", "last_seen_at", "turns", "answered", "first_match_at", "redirects"),
+    ),
+    "api_queries": (
+        "SELECT session_id, MIN(created_at), MAX(created_at), COUNT(*) "
+        "FROM api_queries WHERE id > ? AND id <= ? GROUP BY session_id",
+        ("first_seen_at", "last_seen_at", "api_calls"),
+    ),
+    "feedback": (
+        "SELECT session_id, MIN(created_at), MAX(created_at), COUNT(*), SUM(rating_value) "
+        "FROM feedback WHERE id > ? AND id <= ? GROUP BY session_id",
+        ("first_seen_at", "last_seen_at", "feedback_count", "rating_sum"),
+    ),
+}
+
+
+def _merge_expression(column, dialect):
+    """How a newly aggregated value combines with the stored one."""
+    old, new = f"session_summary.{column}", f"excluded.{column}"
+    if column in ("language", "user_type"):
+        return f"COALESCE({new}, {old})"
+    if column in ("first_seen_at", "first_match_at"):
+        return f"COALESCE({_LEAST[dialect]}({old}, {new}), {old}, {new})"
+    if column == "last_seen_at":
+        return f"COALESCE({_GREATEST[dialect]}({old}, {new}), {old}, {new})"
+    return f"{old} + {new}"
+
+
+def aggregate(cur, sql, source, after_id, upto_id):
+    """Per-session aggregates of source rows with after_id < id <= upto_id."""
+    query, _ = AGGREGATES[source]
+    params = (after_id, upto_id)
+    if source == "queries":
+        params = (REDIRECT_CATEGORY,) + REDIRECT_RESPONSES + params
+    cur.execute(sql(query), params)
+    return cur.fetchall()
+
+
+def _merge(cur, sql, dialect, source, rows):
+    columns = AGGREGATES[source][1]
+    updates = ", ".join(f"{column} = {_merge_expression(column, dialect)}" for column in columns)
+    cur.executemany(
+        sql(
+            f"INSERT INTO session_summary (session_id, {', '.join(columns)}) "
+            f"VALUES ({', '.join('?' for _ in range(len(columns) + 1))}) "
+            f"ON CONFLICT (session_id) DO UPDATE SET {updates}"
+        ),
+        [tuple(row) for row in rows],
+    )
+
+
+def _timestamp(value):
+    # SQLite returns timestamps as text, PostgreSQL as datetime
+    if isinstance(value, str):
+        return datetime.fromisoformat(value[:19])
+    return value
+
+
+def _contributions(cur, sql, session_ids):
+    """What the given sessions currently add to funnel_daily, keyed by (day, user_type, language)."""
+    totals = {}
+    for k in range(0, len(session_ids), LOOKUP_BATCH):
+        batch = session_ids[k:k + LOOKUP_BATCH]
+        cur.execute(
+            sql(
+                "SELECT first_seen_at, user_type, language, turns, first_match_at, redirects, feedback_count, rating_sum "
+                f"FROM session_summary WHERE session_id IN ({', '.join('?' for _ in batch)})"
+            ),
+            batch,
+        )
+        for first_seen, user_type, language, turns, first_match, redirects, feedback_count, rating_sum in cur.fetchall():
+            first_seen = _timestamp(first_seen)
+            key = (first_seen.strftime("%Y-%m-%d"), user_type or "unknown", language or "unknown")
+            seconds = (_timestamp(first_match) - first_seen).total_seconds() if first_match is not None else 0.0
+            counts = (1, int(turns > 0), turns, int(first_match is not None), seconds,
+                      int(redirects > 0), int(feedback_count > 0), feedback_count, rating_sum)
+            totals[key] = [a + b for a, b in zip(totals.get(key, [0] * len(COUNTS)), counts)]
+    return totals
+
+
+def fold(cur, sql, dialect, source, rows):
+    """Merge aggregated rows from `source` into session_summary and move the sessions' funnel_daily counts."""
+    if not rows:
+        return
+    session_ids = [row[0] for row in rows]
+    before = _contributions(cur, sql, session_ids)
+    _merge(cur, sql, dialect, source, rows)
+    after = _contributions(cur, sql, session_ids)
+
+    deltas = []
+    for key in before.keys() | after.keys():
+        old = before.get(key, [0] * len(COUNTS))
+        delta = [b - a for a, b in zip(old, after.get(key, [0] * len(COUNTS)))]
+        if any(delta):
+            deltas.append(key + tuple(delta))
+    if deltas:
+        cur.executemany(
+            sql(
+                f"INSERT INTO funnel_daily (day, user_type, language, {', '.join(COUNTS)}) "
+                f"VALUES ({', '.join('?' for _ in range(len(COUNTS) + 3))}) "
+                "ON CONFLICT (day, user_type, language) DO UPDATE SET "
+                + ", ".join(f"{c} = funnel_daily.{c} + excluded.{c}" for c in COUNTS)
+            ),
+            deltas,
+        )
+
+
+def watermarks(cur):
+    cur.execute("SELECT source, last_id FROM summary_watermarks")
+    return dict(cur.fetchall())
+
+
+def set_watermark(cur, sql, source, last_id):
+    cur.execute(
+        sql("INSERT INTO summary_watermarks (source, last_id) VALUES (?, ?) "
+            "ON CONFLICT (source) DO UPDATE SET last_id = excluded.last_id"),
+        (source, last_id),
+    )
+
+
+def catch_up(cur, sql, dialect, settle_seconds=0):
+    """
+    Fold up to CHUNK_SIZE log ids above each source's watermark into the
+    summary and advance the watermarks. Run it in a short transaction per
+    call, repeating while it returns done=False, so log writers never wait
+    behind a long backlog. With settle_seconds, rows newer than that are left
+    for a later run so inserts still in flight on other nodes are not skipped.
+    Returns (session rows merged, done).
+    """
+    marks = watermarks(cur)
+    cutoff = (datetime.now(timezone.utc) - timedelta(seconds=settle_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+    merged = 0
+    done = True
+    for source in SOURCES:
+        last_id = marks.get(source, 0)
+        if settle_seconds:
+            cur.execute(sql(f"SELECT MAX(id) FROM {source} WHERE id > ? AND created_at <= ?"), (last_id, cutoff))
+        else:
+            cur.execute(f"SELECT MAX(id) FROM {source}")
+        top = cur.fetchone()[0] or 0
+        if top <= last_id:
+            continue
+        upto = min(last_id + CHUNK_SIZE, top)
+        rows = aggregate(cur, sql, source, last_id, upto)
+        fold(cur, sql, dialect, source, rows)
+        set_watermark(cur, sql, source, upto)
+        merged += len(rows)
+        done = done and upto == top
+    return merged, done
+
+
+def prune(cur, sql, before):
+    """
+    Delete sessions last seen before `before`; their counts stay in
+    funnel_daily, which is all reports read. A row logged later for a pruned
+    session is counted as a new session. Returns the rows deleted.
+    """
+    cur.execute(sql("DELETE FROM session_summary WHERE last_seen_at < ?"), (before,))
+    return cur.rowcount
+
+
+def _rates(m):
+    """Derived funnel metrics from summed counts."""
+    seconds, rating_sum, feedback_count = m.pop("seconds_to_first_match"), m.pop("rating_sum"), m.pop("feedback_count")
+    m["avg_turns"] = round(m["turns"] / m["chatted"], 2) if m["chatted"] else 0
+    m["match_rate"] = round(m["matched"] / m["chatted"], 4) if m["chatted"] else 0
+    m["avg_seconds_to_first_match"] = round(seconds / m["matched"], 1) if m["matched"] else None
+    m["redirect_rate"] = round(m["redirected"] / m["chatted"], 4) if m["chatted"] else 0
+    m["feedback_conversion"] = round(m["gave_feedback"] / m["sessions"], 4) if m["sessions"] else 0
+    m["avg_rating"] = round(rating_sum / feedback_count, 2) if feedback_count else None
+    return m
+
+
+def funnel_report(cur, sql, start, end):
+    """Funnel and conversation metrics for sessions first seen between start and end, by user type and language."""
+    cur.execute(
+        sql(
+            f"SELECT user_type, language, {', '.join(f'SUM({c})' for c in COUNTS)} FROM funnel_daily "
+            "WHERE day BETWEEN ? AND ? GROUP BY user_type, language"
+        ),
+        (start[:10], end[:10]),
+    )
+    totals = dict.fromkeys(COUNTS, 0)
+    segments = []
+    for user_type, language, *counts in cur.fetchall():
+        # PostgreSQL returns Decimal sums
+        segment = {name: int(count) for name, count in zip(COUNTS, counts)}
+        segment["seconds_to_first_match"] = float(counts[COUNTS.index("seconds_to_first_match")])
+        for name in COUNTS:
+            totals[name] += segment[name]
+        segments.append({"user_type": user_type, "language": language, **_rates(segment)})
+
+    segments.sort(key=lambda s: s["sessions"], reverse=True)
+    return {"start": start, "end": end, "totals": _rates(totals), "segments": segments}
@@ -0,0 +1,76 @@
+"""
+Single-flight coalescing for concurrent identical lookups.
+
+While a call for a key is in flight, later callers with the same key wait for
+it and share its result (or exception) instead of starting their own. The
+in-flight calls are concurrent.futures.Future objects, so threaded callers
+(`do`) and coroutine callers (`do_async`, from any event loop) join the same
+flight:
+
+    record = flight.do(key, lambda: registry.check_status(reg_number))
+    record = await flight.do_async(key, lambda: asyncio.to_thread(registry.check_status, reg_number))
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._stats = {"calls": 0, "executions": 0, "collapsed": 0, "errors": 0}
+
+    def _join(self, key):
+        """Return (future, is_leader) for key, registering a new flight if none is running."""
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._flights.get(key)
+            if future is not None:
+                self._stats["collapsed"] += 1
+                return future, False
+            future = Future()
+            self._flights[key] = future
+            self._stats["executions"] += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            self._flights.pop(key, None)
+            if error is not None:
+                self._stats["errors"] += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        future, leader = self._join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            self._finish(key, future, error=exc)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def do_async(self, key, fn):
+        """Like `do`, but `fn` returns an awaitable."""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fn()
+        except BaseException as exc:
+            self._finish(key, future, error=exc)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._flights)
+        return stats
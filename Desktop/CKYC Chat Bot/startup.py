@@ -0,0 +1,91 @@
+"""
+One-time startup work for a worker process: schema migrations, index builds
+and connection warm-up, run before the first request instead of during it.
+
+Startup runs its steps once, in order, and records how long each took.
+/readyz reports ready only after every step has finished, so a load balancer
+never routes traffic to a worker that is still warming up or that failed to.
+
+In the foreground a failed step raises, so the worker fails to boot and the
+process manager restarts it. In the background the worker is already serving
+/healthz, so failed steps are retried with backoff, resuming at the step that
+failed.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class Startup:
+    def __init__(self, steps, max_backoff=30.0):
+        self.steps = steps
+        self.max_backoff = max_backoff
+        self.ready = threading.Event()
+        self.timings = {}
+        self.failed_step = None
+        self.error = None
+        self.attempts = 0
+        self._lock = threading.Lock()
+        self._started = False
+        self._next_step = 0
+        self._elapsed = 0.0
+
+    def _claim(self):
+        with self._lock:
+            if self._started:
+                return False
+            self._started = True
+            return True
+
+    def _run_steps(self):
+        """Run the steps not yet done. Raises the first failure."""
+        self.attempts += 1
+        while self._next_step < len(self.steps):
+            name, step = self.steps[self._next_step]
+            begin = time.perf_counter()
+            try:
+                step()
+            except Exception as exc:
+                self.failed_step = name
+                self.error = f"{type(exc).__name__}: {exc}"
+                raise
+            finally:
+                self._elapsed += time.perf_counter() - begin
+            self.timings[name] = round((time.perf_counter() - begin) * 1000, 2)
+            self._next_step += 1
+        self.failed_step = self.error = None
+        self.timings["total"] = round(self._elapsed * 1000, 2)
+        self.ready.set()
+
+    def run(self):
+        """Run every step once; a failed step raises. Later calls return immediately."""
+        if self._claim():
+            self._run_steps()
+        return self.ready.is_set()
+
+    def _run_with_retries(self):
+        backoff = 1.0
+        while True:
+            try:
+                self._run_steps()
+                return
+            except Exception:
+                log.exception("startup step %s failed (attempt %d); retrying in %.0fs", self.failed_step, self.attempts, backoff)
+            time.sleep(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def run_in_background(self):
+        if not self._claim():
+            return None
+        thread = threading.Thread(target=self._run_with_retries, name="startup", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self):
+        status = {"ready": self.ready.is_set(), "timings_ms": dict(self.timings), "attempts": self.attempts}
+        if self.failed_step:
+            status["failed_step"] = self.failed_step
+            status["error"] = self.error
+        return status
@@ -187,7 +187,7 @@ async function sendMessage() {
         // Remove typing indicator
         hideTyping();
 
-        addBotMessage(data.response);
+        addBotMessage(data.response || data.error);
 
         if (data.show_redirect) {
             wrongCount = 0;
@@ -0,0 +1,427 @@
+"""
+Storage backends for chat logging and reporting.
+
+    SQLiteStorage   the local database.py implementation (default)
+    SQLStorage      a client-server SQL database shared by several app nodes,
+                    with a connection pool and batched inserts
+
+Configuration (environment):
+    CKYC_STORAGE          sqlite | postgres | embedded (default sqlite)
+    CKYC_DATABASE_URL     PostgreSQL DSN, or the SQLite file path for `embedded`
+    CKYC_DB_POOL_SIZE     pooled connections per process (default 5)
+    CKYC_BATCH_SIZE       log rows written per batch (default 100)
+    CKYC_BATCH_INTERVAL   longest a logged row waits before it is written, in seconds (default 1)
+
+`embedded` runs SQLStorage on an SQLite file, standing in for the server
+database so the pooled, batched path can be exercised locally.
+"""
+import atexit
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from queue import Empty, Queue
+
+import database
+import session_summary
+
+logger = logging.getLogger(__name__)
+
+
+class Storage:
+    """Interface shared by all storage backends."""
+
+    def init(self):
+        raise NotImplementedError
+
+    def log_session(self, session_id, language, user_type):
+        raise NotImplementedError
+
+    def log_query(self, session_id, user_message, bot_response, category, matched_faq_id, was_answered):
+        raise NotImplementedError
+
+    def log_api_query(self, session_id, query_type, input_value, result):
+        raise NotImplementedError
+
+    def log_feedback(self, session_id, rating, rating_value, feedback_text):
+        raise NotImplementedError
+
+    def get_report(self, report_type, start_date=None, end_date=None):
+        raise NotImplementedError
+
+    def iter_unanswered_queries(self, after_id=0, start=None, end=None, batch_size=1000):
+        """Yield (id, user_message, created_at) for unanswered queries with id > after_id, in id order."""
+        raise NotImplementedError
+
+    def summarize_sessions(self):
+        """Fold log rows added since the last run into the per-session summary."""
+        raise NotImplementedError
+
+    def live_delta(self, after_ids, since):
+        """Live counter delta for rows logged since `since` above after_ids per table, and the new ids."""
+        raise NotImplementedError
+
+    def get_funnel_report(self, report_type, start_date=None, end_date=None):
+        """Session funnel metrics by user type and language, as of the last summarize_sessions()."""
+        raise NotImplementedError
+
+    def warm(self):
+        """Open connections ahead of the first request."""
+
+    def flush(self):
+        """Write out any buffered rows."""
+
+    def close(self):
+        self.flush()
+
+
+class SQLiteStorage(Storage):
+    def init(self):
+        database.init_db()
+
+    def warm(self):
+        database.warm_db()
+
+    def log_session(self, session_id, language, user_type):
+        database.log_session(session_id, language, user_type)
+
+    def log_query(self, session_id, user_message, bot_response, category, matched_faq_id, was_answered):
+        database.log_query(session_id, user_message, bot_response, category, matched_faq_id, was_answered)
+
+    def log_api_query(self, session_id, query_type, input_value, result):
+        database.log_api_query(session_id, query_type, input_value, result)
+
+    def log_feedback(self, session_id, rating, rating_value, feedback_text):
+        database.log_feedback(session_id, rating, rating_value, feedback_text)
+
+    def get_report(self, report_type, start_date=None, end_date=None):
+        return database.get_report(report_type, start_date, end_date)
+
+    def iter_unanswered_queries(self, after_id=0, start=None, end=None, batch_size=1000):
+        return database.iter_unanswered_queries(after_id, start, end, batch_size)
+
+    def summarize_sessions(self):
+        return database.summarize_sessions()
+
+    def live_delta(self, after_ids, since):
+        return database.live_delta(after_ids, since)
+
+    def get_funnel_report(self, report_type, start_date=None, end_date=None):
+        return database.get_funnel_report(report_type, start_date, end_date)
+
+
+SCHEMA = {
+    "chat_sessions": "session_id TEXT NOT NULL, language TEXT DEFAULT 'en', user_type TEXT",
+    "queries": "session_id TEXT NOT NULL, user_message TEXT NOT NULL, bot_response TEXT, category TEXT, matched_faq_id TEXT, was_answered INTEGER DEFAULT 0",
+    "api_queries": "session_id TEXT NOT NULL, query_type TEXT NOT NULL, input_value TEXT, result TEXT",
+    "feedback": "session_id TEXT NOT NULL, rating TEXT NOT NULL, rating_value INTEGER NOT NULL, feedback_text TEXT",
+}
+
+INSERT_COLUMNS = {
+    "chat_sessions": ("session_id", "language", "user_type", "created_at"),
+    "queries": ("session_id", "user_message", "bot_response", "category", "matched_faq_id", "was_answered", "created_at"),
+    "api_queries": ("session_id", "query_type", "input_value", "result", "created_at"),
+    "feedback": ("session_id", "rating", "rating_value", "feedback_text", "created_at"),
+}
+
+ID_COLUMN = {
+    "postgres": "id BIGSERIAL PRIMARY KEY",
+    "sqlite": "id INTEGER PRIMARY KEY AUTOINCREMENT",
+}
+
+
+def _utc_now():
+    # Same UTC text format SQLite's CURRENT_TIMESTAMP produces
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class SQLStorage(Storage):
+    """
+    Logging and reporting on a shared SQL database through any DB-API driver.
+    Log rows are buffered and written with executemany, either when
+    `batch_size` rows are pending or every `batch_interval` seconds.
+    """
+
+    def __init__(self, connect, dialect="postgres", paramstyle="format", pool_size=5, batch_size=100, batch_interval=1.0, pool_timeout=5.0):
+        self._connect = connect
+        self.dialect = dialect
+        self.paramstyle = paramstyle
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        # Rows kept while the database is unreachable before the oldest are dropped
+        self.max_pending = batch_size * 100
+        # Sequence ids can commit out of order across nodes, so the session
+        # summary and live counters leave the newest rows for the next run
+        self.settle_seconds = 0 if dialect == "sqlite" else max(10, batch_interval * 5)
+
+        self._pool = Queue()
+        self._pool_lock = threading.Lock()
+        self._created = 0
+
+        self._batch_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = []
+        self._stop = threading.Event()
+        self._flusher = None
+        if batch_size > 1 and batch_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="ckyc-storage-flush", daemon=True)
+            self._flusher.start()
+
+    def _sql(self, query):
+        if self.paramstyle == "format":
+            return query.replace("?", "%s")
+        return query
+
+    @contextmanager
+    def _connection(self):
+        try:
+            conn = self._pool.get_nowait()
+        except Empty:
+            with self._pool_lock:
+                can_create = self._created < self.pool_size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._pool_lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._pool.get(timeout=self.pool_timeout)
+
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            self._recycle(conn)
+            raise
+        self._pool.put(conn)
+
+    def _recycle(self, conn):
+        """Return a connection to the pool after an error, or drop it if it is broken."""
+        try:
+            conn.rollback()
+        except Exception:
+            try:
+                conn.close()
+            except Exception:
+                pass
+            with self._pool_lock:
+                self._created -= 1
+            return
+        self._pool.put(conn)
+
+    def warm(self):
+        """Fill the pool up to pool_size connections."""
+        with self._pool_lock:
+            missing = self.pool_size - self._created
+            self._created += missing
+        for _ in range(missing):
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._pool_lock:
+                    self._created -= 1
+                raise
+            self._pool.put(conn)
+
+    def init(self):
+        with self._connection() as conn:
+            cur = conn.cursor()
+            for table, columns in SCHEMA.items():
+                cur.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({ID_COLUMN[self.dialect]}, {columns}, "
+                    "created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+                )
+                cur.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table} (created_at)")
+            for statement in session_summary.SCHEMA:
+                cur.execute(statement)
+
+    def _enqueue(self, table, row):
+        with self._batch_lock:
+            self._pending.append((table, row + (_utc_now(),)))
+            full = len(self._pending) >= self.batch_size
+        if full or self._flusher is None:
+            self.flush()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._batch_lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+
+            by_table = defaultdict(list)
+            for table, row in pending:
+                by_table[table].append(row)
+            try:
+                with self._connection() as conn:
+                    cur = conn.cursor()
+                    for table, rows in by_table.items():
+                        columns = INSERT_COLUMNS[table]
+                        placeholders = ", ".join("?" for _ in columns)
+                        cur.executemany(self._sql(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"), rows)
+            except Exception:
+                logger.exception("Writing %d log rows failed; keeping them for the next flush", len(pending))
+                with self._batch_lock:
+                    self._pending = (pending + self._pending)[-self.max_pending:]
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.batch_interval):
+            self.flush()
+
+    def log_session(self, session_id, language, user_type):
+        self._enqueue("chat_sessions", (session_id, language, user_type))
+
+    def log_query(self, session_id, user_message, bot_response, category, matched_faq_id, was_answered):
+        self._enqueue("queries", (session_id, user_message, bot_response, category, matched_faq_id, was_answered))
+
+    def log_api_query(self, session_id, query_type, input_value, result):
+        self._enqueue("api_queries", (session_id, query_type, input_value, result))
+
+    def log_feedback(self, session_id, rating, rating_value, feedback_text):
+        self._enqueue("feedback", (session_id, rating, rating_value, feedback_text))
+
+    def get_report(self, report_type, start_date=None, end_date=None):
+        self.flush()
+        start, end = database.report_range(report_type, start_date, end_date)
+        params = (start, end)
+        where = "WHERE created_at BETWEEN ? AND ?"
+
+        with self._connection() as conn:
+            cur = conn.cursor()
+            cur.execute(self._sql(f"SELECT was_answered, COUNT(*) FROM queries {where} GROUP BY was_answered"), params)
+            answer_stats = dict(cur.fetchall())
+
+            cur.execute(self._sql(f"SELECT category, COUNT(*) FROM queries {where} GROUP BY category"), params)
+            categories = Counter()
+            for category, count in cur.fetchall():
+                categories[category or "Uncategorized"] += count
+
+            cur.execute(self._sql(f"SELECT rating, COUNT(*) FROM feedback {where} GROUP BY rating"), params)
+            feedback_stats = Counter(dict(cur.fetchall()))
+
+            cur.execute(self._sql(f"SELECT query_type, COUNT(*) FROM api_queries {where} GROUP BY query_type"), params)
+            api_stats = Counter(dict(cur.fetchall()))
+
+            cur.execute(
+                self._sql(f"SELECT user_message, bot_response, category, was_answered, created_at FROM queries {where} ORDER BY created_at DESC LIMIT 50"),
+                params,
+            )
+            recent = []
+            for user_message, bot_response, category, was_answered, created_at in cur.fetchall():
+                if isinstance(created_at, datetime):
+                    created_at = created_at.strftime("%Y-%m-%d %H:%M:%S")
+                recent.append({
+                    "user_message": user_message,
+                    "bot_response": bot_response,
+                    "category": category,
+                    "was_answered": was_answered,
+                    "created_at": created_at,
+                })
+
+        return {
+            "period": report_type,
+            "start": start,
+            "end": end,
+            "total_queries": sum(answer_stats.values()),
+            "answered": answer_stats.get(1, 0),
+            "not_answered": answer_stats.get(0, 0),
+            "categories": [{"category": k, "count": v} for k, v in categories.most_common()],
+            "feedback": [{"rating": k, "count": v} for k, v in feedback_stats.most_common()],
+            "api_queries": [{"type": k, "count": v} for k, v in api_stats.most_common()],
+            "recent_queries": recent,
+        }
+
+    def iter_unanswered_queries(self, after_id=0, start=None, end=None, batch_size=1000):
+        self.flush()
+        start = start or "2000-01-01 00:00:00"
+        end = end or datetime.now().strftime("%Y-%m-%d 23:59:59")
+        last_id = after_id
+        while True:
+            # Keyset pagination keeps each round trip small on any driver
+            with self._connection() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    self._sql(
+                        "SELECT id, user_message, created_at FROM queries "
+                        "WHERE was_answered = 0 AND id > ? AND created_at BETWEEN ? AND ? ORDER BY id LIMIT ?"
+                    ),
+                    (last_id, start, end, batch_size),
+                )
+                rows = cur.fetchall()
+            if not rows:
+                return
+            yield from rows
+            last_id = rows[-1][0]
+
+    def summarize_sessions(self):
+        self.flush()
+        merged, done = 0, False
+        while True:
+            # One short transaction per chunk, so a backlog never holds the lock for long
+            with self._connection() as conn:
+                cur = conn.cursor()
+                cur.execute(session_summary.LOCK[self.dialect])
+                count, done = session_summary.catch_up(cur, self._sql, self.dialect, self.settle_seconds)
+            merged += count
+            if done:
+                return merged
+            time.sleep(session_summary.CHUNK_PAUSE)
+
+    def live_delta(self, after_ids, since):
+        with self._connection() as conn:
+            return database.live_delta_rows(conn.cursor(), self._sql, after_ids, since, self.settle_seconds)
+
+    def get_funnel_report(self, report_type, start_date=None, end_date=None):
+        start, end = database.report_range(report_type, start_date, end_date)
+        with self._connection() as conn:
+            report = session_summary.funnel_report(conn.cursor(), self._sql, start, end)
+        return {"period": report_type, **report}
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+
+def create_storage_from_env():
+    kind = os.environ.get("CKYC_STORAGE", "sqlite")
+    if kind == "sqlite":
+        return SQLiteStorage()
+
+    options = {
+        "pool_size": int(os.environ.get("CKYC_DB_POOL_SIZE", 5)),
+        "batch_size": int(os.environ.get("CKYC_BATCH_SIZE", 100)),
+        "batch_interval": float(os.environ.get("CKYC_BATCH_INTERVAL", 1)),
+    }
+    url = os.environ.get("CKYC_DATABASE_URL", "")
+    if kind == "postgres":
+        import psycopg2
+
+        storage = SQLStorage(lambda: psycopg2.connect(url), dialect="postgres", paramstyle="format", **options)
+    elif kind == "embedded":
+        path = url or os.path.join(os.path.dirname(__file__), "ckyc_shared.db")
+        storage = SQLStorage(
+            lambda: sqlite3.connect(path, timeout=10, check_same_thread=False),
+            dialect="sqlite",
+            paramstyle="qmark",
+            **options,
+        )
+    else:
+        raise ValueError(f"Unknown CKYC_STORAGE backend: {kind}")
+
+    atexit.register(storage.close)
+    return storage
@@ -0,0 +1,77 @@
+"""
+Local stand-in for the CKYC registry API, for development and offline load tests.
+
+    python stub_server.py --port 5050 --latency-ms 80 --jitter-ms 40 --error-rate 0.02
+
+Then start the app with CKYC_API_URL=http://127.0.0.1:5050 to route all
+lookups through the HTTP client, connection pool and circuit breaker.
+"""
+import argparse
+import json
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+from ckyc_client import ENDPOINTS, simulated_record
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        parts = urlsplit(self.path).path.strip("/").split("/")
+        if len(parts) != 2 or parts[0] not in ENDPOINTS or not parts[1]:
+            self._send(404, {"error": "not found"})
+            return
+
+        server = self.server
+        delay = server.latency + random.uniform(0, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+        if random.random() < server.error_rate:
+            self._send(503, {"error": "injected failure"})
+            return
+
+        self._send(200, simulated_record(parts[0], unquote(parts[1])))
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_server(host="127.0.0.1", port=5050, latency_ms=0, jitter_ms=0, error_rate=0.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), StubHandler)
+    server.daemon_threads = True
+    server.latency = latency_ms / 1000.0
+    server.jitter = jitter_ms / 1000.0
+    server.error_rate = error_rate
+    server.verbose = verbose
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CKYC registry stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    parser.add_argument("--latency-ms", type=float, default=50, help="base latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="random extra latency, uniform in [0, jitter]")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 503")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.verbose)
+    print(f"CKYC stub registry listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -139,6 +139,26 @@ TRANSLATIONS = {
         "en": "You will be redirected to the Web Portal to raise your Query/Complaint.",
         "hi": "आपको अपना प्रश्न/शिकायत दर्ज करने के लिए वेब पोर्टल पर भेजा जाएगा।",
     },
+    "invalid_ckyc_number": {
+        "en": "Please enter a valid 14-digit CKYC number.",
+        "hi": "कृपया एक मान्य 14-अंकीय CKYC नंबर दर्ज करें।",
+    },
+    "registry_unavailable": {
+        "en": "The CKYC Registry is not reachable right now. Please try again in a few minutes.",
+        "hi": "CKYC रजिस्ट्री अभी उपलब्ध नहीं है। कृपया कुछ मिनट बाद पुनः प्रयास करें।",
+    },
+    "record_not_found": {
+        "en": "No record was found for the number you entered. Please check it and try again.",
+        "hi": "आपके द्वारा दर्ज की गई संख्या के लिए कोई रिकॉर्ड नहीं मिला। कृपया इसे जांचें और पुनः प्रयास करें।",
+    },
+    "rate_limited": {
+        "en": "You are sending requests too quickly. Please wait a moment and try again.",
+        "hi": "आप बहुत तेज़ी से अनुरोध भेज रहे हैं। कृपया थोड़ा रुककर पुनः प्रयास करें।",
+    },
+    "server_busy": {
+        "en": "The service is busy right now. Please try again in a moment.",
+        "hi": "सेवा अभी व्यस्त है। कृपया थोड़ी देर में पुनः प्रयास करें।",
+    },
 }
 
 
@@ -146,3 +166,23 @@ def t(key, lang="en"):
     """Get translation for a key in the given language."""
     entry = TRANSLATIONS.get(key, {})
     return entry.get(lang, entry.get("en", key))
+
+
+# Every key resolved for one language, built once per language by build_index()
+_BY_LANGUAGE = {}
+
+
+def build_index():
+    """Resolve all translations for every language that has any."""
+    langs = {"en"}
+    for entry in TRANSLATIONS.values():
+        langs.update(entry)
+    for lang in langs:
+        _BY_LANGUAGE[lang] = {key: val.get(lang, val.get("en", key)) for key, val in TRANSLATIONS.items()}
+    return _BY_LANGUAGE
+
+
+def translations_for(lang):
+    """All translations for a language; unknown languages get English."""
+    index = _BY_LANGUAGE or build_index()
+    return index.get(lang, index["en"])